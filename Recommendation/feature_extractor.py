@@ -1,26 +1,55 @@
 # working reccomendation system use in cron jobs after process.py
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
 import numpy as np
 import pandas as pd
-import librosa, requests, tempfile, os, time
+import os, sys, time, argparse, hashlib
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.preprocessing import MinMaxScaler
-import faiss
+from scipy import sparse
 from datetime import datetime
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.bulk_writer import BulkWriter
+from shared.vector_codec import encode_vector, VectorStack, VECTOR_FIELDS, VECTOR_FORMAT, VECTOR_FORMATS
+from vector_index import VectorIndex, INDEX_TYPE, INDEX_TYPES
+from shared.audio_features import audio_features, audio_windows, audio_key, AUDIO_DIM, AUDIO_WINDOW, AUDIO_WINDOWS
+
 MODE = "incremental"   # "incremental" or "full"
 TOP_N = 10
+IN_FLIGHT_PER_WORKER = 2   # queued audio jobs (≈ downloads) per worker
+WRITE_CHUNK = 1000     # documents per bulk write
+
+# play counts move every day: a song is re-vectorized for popularity only
+# once its scaled value drifts by POP_TOLERANCE, and at most POP_DIRTY_MAX
+# songs per run (largest drift first, the rest catch up in later runs)
+POP_TOLERANCE = 0.01
+POP_DIRTY_MAX = 5000
+# refit the min/max play count once the catalog's range outgrows the
+# stored one by this factor; every vector is then rescaled (stored audio)
+POP_REFIT_GROWTH = 1.25
 
-start_time = time.time()
+# vector = [meta (TF-IDF) | audio | hook ratio | popularity], each weighted
+META_WEIGHT, AUDIO_WEIGHT, HOOK_WEIGHT, POP_WEIGHT = 0.4, 0.3, 0.1, 0.2
 
 # ---------------- DB ----------------
-client = MongoClient(os.environ["MONGO_URI"])
-db = client.musicdb
-songs_col = db.songs
-vec_col = db.song_vectors
-rec_col = db.song_recommendations
+# Connected by run(): spawned audio workers re-import this script and
+# only need audio_features, not a client of their own.
+client = db = songs_col = vec_col = rec_col = state_col = None
+
+def connect():
+    global client, db, songs_col, vec_col, rec_col, state_col
+
+    client = MongoClient(os.environ["MONGO_URI"])
+    db = client.musicdb
+    songs_col = db.songs
+    vec_col = db.song_vectors
+    rec_col = db.song_recommendations
+    state_col = db.recommender_state   # fitted model state shared across runs
 
-print("[STEP] Connected to MongoDB")
+    print("[STEP] Connected to MongoDB")
 
 # ---------------- HELPERS ----------------
 def extract_artists(artists):
@@ -30,148 +59,494 @@ def extract_artists(artists):
             names.append(a["name"])
     return " ".join(set(names))
 
-def hook_ratio(song):
-    h = song.get("hook", {}).get("primehook")
-    d = song.get("duration")
-    if not h or not d:
-        return 0
-    m, s = h.split(":")
-    return (int(m)*60+int(s)) / d
-
-def build_text(song):
-    art = extract_artists(song["artists"])
-    return f"{art} {art} {song['language']} {song['language']} {song['label']} {song['year']} {song['type']}"
+def progress(stage, done, total, started):
+    rate = done / max(time.time() - started, 1e-6)
+    print(f"[PROGRESS] {stage}: {done}/{total} ({rate:.0f}/s)")
+
+def hook_seconds(df):
+    # "mm:ss" prime hook → seconds, NaN when there is none
+    mmss = df["primehook"].str.extract(r"^(\d+):(\d+)$").astype(float)
+    return mmss[0] * 60 + mmss[1]
+
+def hook_ratio(df):
+    # prime hook / duration, 0 when either is missing
+    return (df["hook_start"] / df["duration"].where(df["duration"] > 0)).fillna(0)
+
+def build_text(df):
+    cols = {c: df[c].fillna("").astype(str) for c in ["artists", "language", "label", "year", "type"]}
+    art, lang = cols["artists"], cols["language"]
+    return art + " " + art + " " + lang + " " + lang + " " + cols["label"] + " " + cols["year"] + " " + cols["type"]
+
+# ---------------- CATALOG ----------------
+# Only what the job reads: the 3rd download URL ($slice), artist names,
+# text fields, prime hook, duration and play count.
+CATALOG_FIELDS = {
+    "_id": 0, "id": 1, "language": 1, "label": 1, "year": 1, "type": 1,
+    "duration": 1, "playCount": 1, "hook.primehook": 1,
+    "artists.primary.name": 1, "artists.featured.name": 1, "artists.all.name": 1,
+    "downloadUrl": {"$slice": [2, 1]}
+}
+LOAD_CHUNK = 5000
+
+def flatten(song):
+    url = song.get("downloadUrl") or [{}]
+    return (
+        song.get("id"),
+        extract_artists(song.get("artists") or {}),
+        song.get("language"), song.get("label"), song.get("year"), song.get("type"),
+        (song.get("hook") or {}).get("primehook"),
+        song.get("duration"),
+        song.get("playCount"),
+        url[0].get("url")
+    )
 
-def audio_features(url):
+def load_catalog():
+    """One flat row per song, read in LOAD_CHUNK-sized cursor batches."""
+    columns = ["id", "artists", "language", "label", "year", "type", "primehook", "duration", "playCount", "url"]
+    rows = []
+    total = songs_col.estimated_document_count()
+    t0 = time.time()
+
+    for song in songs_col.find({}, CATALOG_FIELDS, batch_size=LOAD_CHUNK):
+        rows.append(flatten(song))
+        if len(rows) % LOAD_CHUNK == 0:
+            progress("catalog", len(rows), total, t0)
+
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    df["playCount"] = pd.to_numeric(df["playCount"], errors="coerce").fillna(0)
+    df["duration"] = pd.to_numeric(df["duration"], errors="coerce")
+    return df
+
+def extract_audio(jobs, workers=1):
+    """
+    audio_features over (song_id, url, windows) jobs, yielded in job order.
+    With workers > 1 the downloads + decoding run in a process pool with
+    at most IN_FLIGHT_PER_WORKER * workers songs in flight at once.
+    """
+    if workers <= 1:
+        for job in jobs:
+            yield audio_features(*job)
+        return
+
+    # spawn: pymongo's monitor threads are already running, don't fork them
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        pending = deque()
+
+        for job in jobs:
+            pending.append((job, pool.submit(audio_features, *job)))
+            if len(pending) >= workers * IN_FLIGHT_PER_WORKER:
+                yield collect(*pending.popleft())
+
+        while pending:
+            yield collect(*pending.popleft())
+
+def collect(job, future):
+    # audio_features already falls back to zeros; this covers a dead worker
     try:
-        r = requests.get(url, timeout=10)
-        with tempfile.NamedTemporaryFile(delete=False) as f:
-            f.write(r.content)
-            path = f.name
-
-        y, sr = librosa.load(path, sr=None)
-        os.remove(path)
-
-        mfcc = np.mean(librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13), axis=1)
-        tempo = librosa.beat.tempo(y=y, sr=sr)[0]
-        centroid = np.mean(librosa.feature.spectral_centroid(y=y, sr=sr))
-
-        return np.concatenate(([tempo, centroid], mfcc))
+        return future.result()
     except Exception as e:
-        print(f"[ERROR] Audio feature failed: {e}")
-        return np.zeros(15)
-
-# ---------------- LOAD SONGS ----------------
-songs = list(songs_col.find({}, {"_id": 0}))
-df = pd.DataFrame(songs)
-
-print(f"[INFO] Total songs in DB: {len(df)}")
-
-df["text"] = df.apply(build_text, axis=1)
-df["hook_ratio"] = df.apply(hook_ratio, axis=1)
-
-# ---------------- EXISTING VECTORS ----------------
-existing_vec_ids = set(vec_col.distinct("song_id"))
-print(f"[INFO] Existing vectors: {len(existing_vec_ids)}")
-
-if MODE == "incremental":
-    df_new = df[~df["id"].isin(existing_vec_ids)]
-else:
-    df_new = df
-
-print(f"[INFO] Songs to vectorize: {len(df_new)}")
-
-# ---------------- BUILD VECTORS ----------------
-print("[STEP] Building metadata vectors (TF-IDF)")
-tfidf = TfidfVectorizer(max_features=1000)
-meta_vec = tfidf.fit_transform(df["text"]).toarray()
-
-print("[STEP] Scaling popularity")
-scaler = MinMaxScaler()
-pop_vec = scaler.fit_transform(df[["playCount"]])
-
-print("[STEP] Extracting audio features")
-audio_vecs = []
-for i, (_, song) in enumerate(df_new.iterrows(), 1):
-    print(f"[AUDIO] {i}/{len(df_new)} → {song['id']}")
-    url = song["downloadUrl"][2]["url"]
-    audio_vecs.append(audio_features(url))
-
-audio_vecs = np.array(audio_vecs)
-hook_vec = df_new[["hook_ratio"]].values
-
-print("[STEP] Combining final vectors")
-final_vectors_new = np.hstack([
-    meta_vec[df_new.index] * 0.4,
-    audio_vecs * 0.3,
-    hook_vec * 0.1,
-    pop_vec[df_new.index] * 0.2
-]).astype("float32")
-
-# ---------------- STORE NEW VECTORS ----------------
-if MODE == "full":
-    print("[WARN] FULL mode: clearing old vectors")
-    vec_col.delete_many({})
-
-print("[STEP] Storing vectors in DB")
-for i, song in df_new.iterrows():
-    vec_col.insert_one({
-        "song_id": song["id"],
-        "vector": final_vectors_new[list(df_new.index).index(i)].tolist(),
-        "updated_at": datetime.utcnow()
-    })
-
-# ---------------- LOAD ALL VECTORS ----------------
-print("[STEP] Loading all vectors")
-all_vec_docs = list(vec_col.find({}, {"_id": 0}))
-vec_df = pd.DataFrame(all_vec_docs)
-
-vectors = np.vstack(vec_df["vector"].values).astype("float32")
-
-# ---------------- FAISS INDEX ----------------
-print("[STEP] Building FAISS index")
-dim = vectors.shape[1]
-index = faiss.IndexFlatL2(dim)
-index.add(vectors)
-
-# ---------------- EXISTING RECOMMENDATIONS ----------------
-existing_rec_ids = set(rec_col.distinct("song_id"))
-print(f"[INFO] Existing recommendations: {len(existing_rec_ids)}")
-
-if MODE == "incremental":
-    df_rec = vec_df[~vec_df["song_id"].isin(existing_rec_ids)]
-else:
-    print("[WARN] FULL mode: clearing old recommendations")
-    rec_col.delete_many({})
-    df_rec = vec_df
-
-print(f"[INFO] Songs to recommend: {len(df_rec)}")
-
-# ---------------- BUILD RECOMMENDATIONS ----------------
-print("[STEP] Searching nearest neighbors")
-D, I = index.search(vectors, TOP_N + 1)
-
-print("[STEP] Writing recommendations")
-for i, row in df_rec.iterrows():
-    song_id = row["song_id"]
-    idx = vec_df.index[vec_df["song_id"] == song_id][0]
-
-    recs = []
-    for j in I[idx][1:]:
-        recs.append({"song_id": vec_df.iloc[j]["song_id"]})
-
-    rec_col.update_one(
-        {"song_id": song_id},
-        {"$set": {
-            "song_id": song_id,
-            "recommended": recs,
+        print(f"[ERROR] Audio worker failed ({job[0]}): {e}")
+        return np.zeros(AUDIO_DIM)
+
+def load_vectors(query):
+    """(song ids, float32 matrix) for the matching stored vectors."""
+    song_ids = []
+    stack = VectorStack(vec_col.count_documents(query))
+    for doc in vec_col.find(query, {"_id": 0, "song_id": 1, **VECTOR_FIELDS}):
+        if stack.append(doc):
+            song_ids.append(doc["song_id"])
+    return song_ids, stack.matrix()
+
+# ---------------- TF-IDF STATE ----------------
+# The fitted vocabulary + IDF weights are kept in Mongo so incremental
+# runs vectorize new songs in the same space as the stored vectors.
+# Only a FULL run (or the very first run) refits them.
+def save_tfidf(tfidf):
+    terms = [None] * len(tfidf.vocabulary_)
+    for term, col in tfidf.vocabulary_.items():
+        terms[col] = term
+
+    state_col.replace_one(
+        {"_id": "tfidf"},
+        {
+            "_id": "tfidf",
+            "terms": terms,
+            "idf": tfidf.idf_.tolist(),
             "updated_at": datetime.utcnow()
-        }},
+        },
         upsert=True
     )
 
-end_time = time.time()
-elapsed = round((end_time - start_time) / 60, 2)
+def load_tfidf():
+    doc = state_col.find_one({"_id": "tfidf"})
+    if not doc:
+        return None
+
+    tfidf = TfidfVectorizer(max_features=1000, vocabulary=doc["terms"])
+    tfidf.idf_ = np.array(doc["idf"])
+    return tfidf
+
+# ---------------- POPULARITY SCALE ----------------
+# Min/max play count, kept like the TF-IDF state so a run scales new
+# play counts the same way the stored vectors were scaled. Counts only
+# grow, so incremental runs refit once the range has outgrown it.
+def save_pop_scale(lo, hi):
+    state_col.replace_one(
+        {"_id": "popularity"},
+        {"_id": "popularity", "min": lo, "max": hi, "updated_at": datetime.utcnow()},
+        upsert=True
+    )
 
-print(f"✅ Hybrid recommender built in {MODE.upper()} mode")
-print(f"⏱️ Total time: {elapsed} minutes")
+def load_pop_scale():
+    doc = state_col.find_one({"_id": "popularity"})
+    return (doc["min"], doc["max"]) if doc else None
+
+def scale_pop(play_count, lo, hi):
+    return ((play_count - lo) / max(hi - lo, 1)).clip(0, 1)
+
+def pop_outgrown(play_count, lo, hi):
+    if not len(play_count):
+        return False
+    return float(play_count.max() - play_count.min()) > POP_REFIT_GROWTH * max(hi - lo, 1)
+
+# ---------------- FINGERPRINTS ----------------
+# The inputs each vector component was built from, stored with the
+# vector so a run redoes only what changed: hashes for the text and
+# audio URL, rounded values for hook ratio and scaled popularity.
+FINGERPRINT = ("meta", "audio", "hook", "pop")
+
+def digest(values):
+    return [hashlib.md5(str(v).encode()).hexdigest()[:16] for v in values]
+
+def fingerprints(df):
+    return pd.DataFrame({
+        "meta": digest(df["text"]),
+        "audio": digest(df["audio_key"]),
+        "hook": df["hook_ratio"].round(6),
+        "pop": df["pop"].round(3)
+    }, index=df.index)
+
+def stored_fingerprints():
+    """Fingerprint per stored vector, indexed by song id (NaN = unknown)."""
+    song_ids, rows = [], []
+    for doc in vec_col.find({}, {"_id": 0, "song_id": 1, "fingerprint": 1}):
+        song_ids.append(doc["song_id"])
+        rows.append(doc.get("fingerprint") or {})
+    return pd.DataFrame.from_records(rows, index=song_ids, columns=list(FINGERPRINT))
+
+def stored_audio(song_ids):
+    """Audio features recovered from stored vectors (unweighted)."""
+    audio = {}
+    for lo in range(0, len(song_ids), WRITE_CHUNK):
+        ids, vectors = load_vectors({"song_id": {"$in": song_ids[lo:lo + WRITE_CHUNK]}})
+        audio.update(zip(ids, vectors[:, -(AUDIO_DIM + 2):-2] / AUDIO_WEIGHT))
+    return audio
+
+def pop_drift(df, fp, stored_pop, is_new):
+    """
+    Songs whose popularity moved enough to re-vectorize them, capped at
+    POP_DIRTY_MAX (largest drift first). Missing stored values count.
+    """
+    drift = (fp["pop"] - pd.to_numeric(stored_pop, errors="coerce")).abs().fillna(np.inf).where(~is_new, 0)
+    moved = drift >= POP_TOLERANCE
+
+    if moved.sum() > POP_DIRTY_MAX:
+        print(f"[INFO] Popularity moved for {int(moved.sum())} songs, updating the top {POP_DIRTY_MAX}")
+        keep = drift[moved].nlargest(POP_DIRTY_MAX).index
+        moved = pd.Series(df.index.isin(keep), index=df.index)
+
+    return moved
+
+def existing_recommendations(moved):
+    """
+    (radius per song, songs whose list names any of moved), from one
+    pass over song_recommendations.
+    """
+    radius, holders = {}, set()
+    for doc in rec_col.find({}, {"_id": 0, "song_id": 1, "radius": 1, "recommended.song_id": 1}):
+        radius[doc["song_id"]] = doc.get("radius", np.inf)
+        if any(r["song_id"] in moved for r in doc.get("recommended") or []):
+            holders.add(doc["song_id"])
+    return radius, holders
+
+# ---------------- RUN ----------------
+def run(workers=1, index_type=INDEX_TYPE, vector_format=VECTOR_FORMAT, audio_window=AUDIO_WINDOW):
+    start_time = time.time()
+    connect()
+
+    # ---------------- LOAD SONGS ----------------
+    df = load_catalog()
+
+    print(f"[INFO] Total songs in DB: {len(df)}")
+
+    df["text"] = build_text(df)
+    df["hook_start"] = hook_seconds(df)
+    df["hook_ratio"] = hook_ratio(df)
+
+    # what the audio block is computed from: the URL, plus the decoded
+    # windows in hook mode (so a rehook also refreshes the audio)
+    if audio_window == "hook":
+        df["windows"] = [audio_windows(h, d) for h, d in zip(df["hook_start"], df["duration"])]
+    else:
+        df["windows"] = None
+    df["audio_key"] = [audio_key(u, w) for u, w in zip(df["url"], df["windows"])]
+
+    # ---------------- POPULARITY ----------------
+    pop_scale = load_pop_scale() if MODE == "incremental" else None
+    refit_pop = pop_scale is not None and pop_outgrown(df["playCount"], *pop_scale)
+
+    if refit_pop:
+        print(f"[INFO] Play counts outgrew the popularity scale {pop_scale}, refitting")
+
+    if pop_scale is None or refit_pop:
+        # saved once the vectors built on it are stored
+        pop_scale = (float(df["playCount"].min()), float(df["playCount"].max())) if len(df) else (0.0, 0.0)
+
+    df["pop"] = scale_pop(df["playCount"], *pop_scale)
+    df = df[["id", "text", "hook_ratio", "pop", "url", "windows", "audio_key"]]
+    fp = fingerprints(df)
+
+    # ---------------- EXISTING VECTORS ----------------
+    stored = stored_fingerprints()
+    existing_vec_ids = set(stored.index)
+    print(f"[INFO] Existing vectors: {len(existing_vec_ids)}")
+
+    if MODE == "incremental":
+        is_new = ~df["id"].isin(existing_vec_ids)
+        old = stored.reindex(df["id"]).set_axis(df.index)
+
+        # a missing fingerprint counts as changed (NaN != anything) ...
+        changed = {c: ~is_new & (old[c] != fp[c]) for c in FINGERPRINT}
+        if refit_pop:
+            # new scale: every stored vector is rescaled (no cap, stored audio)
+            changed["pop"] = ~is_new
+        else:
+            changed["pop"] = pop_drift(df, fp, old["pop"], is_new)
+        # ... except audio: vectors from before fingerprints keep theirs
+        changed["audio"] &= old["audio"].notna()
+
+        dirty = is_new | np.logical_or.reduce([changed[c] for c in FINGERPRINT])
+        df_new = df[dirty]
+        needs_audio = (is_new | changed["audio"])[dirty].to_numpy()
+
+        counts = ", ".join(f"{c} {int(changed[c].sum())}" for c in FINGERPRINT)
+        print(f"[INFO] Songs to vectorize: {len(df_new)} ({int(is_new.sum())} new; changed: {counts})")
+    else:
+        df_new = df
+        needs_audio = np.ones(len(df), dtype=bool)
+        print(f"[INFO] Songs to vectorize: {len(df_new)}")
+
+    # ---------------- BUILD VECTORS ----------------
+    print("[STEP] Building metadata vectors (TF-IDF)")
+    tfidf = load_tfidf() if MODE == "incremental" else None
+
+    if tfidf is None:
+        print("[INFO] Fitting TF-IDF vocabulary on all songs")
+        tfidf = TfidfVectorizer(max_features=1000)
+        tfidf.fit(df["text"])
+        save_tfidf(tfidf)
+    else:
+        print(f"[INFO] Reusing stored TF-IDF vocabulary ({len(tfidf.vocabulary_)} terms)")
+
+    # sparse, changed rows only (sklearn rejects an empty batch)
+    if len(df_new):
+        meta_vec_new = tfidf.transform(df_new["text"])
+    else:
+        meta_vec_new = sparse.csr_matrix((0, len(tfidf.vocabulary_)))
+
+    audio_vecs = np.zeros((len(df_new), AUDIO_DIM))
+    dirty_ids = df_new["id"].tolist()
+
+    reuse = np.flatnonzero(~needs_audio)
+    if len(reuse):
+        print(f"[STEP] Reusing stored audio features for {len(reuse)} songs")
+        audio = stored_audio([dirty_ids[row] for row in reuse])
+        for row in reuse:
+            if dirty_ids[row] in audio:
+                audio_vecs[row] = audio[dirty_ids[row]]
+            else:
+                needs_audio[row] = True   # vector vanished meanwhile
+
+    fetch = np.flatnonzero(needs_audio)
+    print(f"[STEP] Extracting audio features for {len(fetch)} songs ({workers} workers, {audio_window} window)")
+    urls, windows = df_new["url"].tolist(), df_new["windows"].tolist()
+    jobs = [(dirty_ids[row], urls[row], windows[row]) for row in fetch]
+    for i, vec in enumerate(extract_audio(jobs, workers)):
+        print(f"[AUDIO] {i + 1}/{len(jobs)} → {jobs[i][0]}")
+        audio_vecs[fetch[i]] = vec
+
+    print("[STEP] Combining final vectors")
+    final_vectors_new = np.hstack([
+        (meta_vec_new * META_WEIGHT).toarray(),
+        audio_vecs * AUDIO_WEIGHT,
+        df_new[["hook_ratio"]].to_numpy() * HOOK_WEIGHT,
+        df_new[["pop"]].to_numpy() * POP_WEIGHT
+    ]).astype("float32")
+
+    # ---------------- STORE VECTORS ----------------
+    if MODE == "full":
+        print("[WARN] FULL mode: clearing old vectors")
+        vec_col.delete_many({})
+
+    print(f"[STEP] Storing vectors in DB ({vector_format})")
+    fp_docs = fp.loc[df_new.index].to_dict("records")
+    now = datetime.utcnow()
+    t0 = time.time()
+
+    with BulkWriter(vec_col, batch_size=WRITE_CHUNK) as writer:
+        for lo in range(0, len(dirty_ids), WRITE_CHUNK):
+            hi = min(lo + WRITE_CHUNK, len(dirty_ids))
+            for song_id, vec, song_fp in zip(dirty_ids[lo:hi], final_vectors_new[lo:hi], fp_docs[lo:hi]):
+                fields = encode_vector(vec, vector_format)
+                update = {"$set": {
+                    "song_id": song_id,
+                    **fields,
+                    "fingerprint": song_fp,
+                    "updated_at": now
+                }}
+                # switching back to the array format drops the binary header
+                header = {k: "" for k in ("dim", "dtype") if k not in fields}
+                if header and song_id in existing_vec_ids:
+                    update["$unset"] = header
+
+                writer.add(UpdateOne({"song_id": song_id}, update, upsert=True), song_id)
+            writer.flush()
+            progress("vectors", hi, len(dirty_ids), t0)
+
+    if load_pop_scale() != pop_scale:
+        save_pop_scale(*pop_scale)
+
+    # ---------------- FAISS INDEX ----------------
+    print("[STEP] Updating FAISS index")
+    stored_ids = set(dirty_ids) if MODE == "full" else existing_vec_ids | set(dirty_ids)
+    dim = final_vectors_new.shape[1]
+
+    index = VectorIndex(kind=index_type)
+    loaded = MODE == "incremental" and index.load(mmap=not dirty_ids)
+
+    if loaded and (index.dim != dim or not stored_ids.issuperset(index.song_ids)):
+        print("[WARN] Stored FAISS index doesn't match song_vectors")
+        loaded = False
+
+    if loaded:
+        indexed = np.array([sid in index.rows for sid in dirty_ids], dtype=bool)
+        ids = np.array(dirty_ids, dtype=object)
+
+        # changed vectors are swapped (remove + add), new ones appended
+        index.replace(ids[indexed].tolist(), final_vectors_new[indexed])
+        index.add(ids[~indexed].tolist(), final_vectors_new[~indexed])
+
+    if not loaded and MODE == "full":
+        index.build(dirty_ids, final_vectors_new)
+
+    elif not loaded:
+        print("[INFO] Rebuilding FAISS index from stored vectors")
+        index.build(*load_vectors({}))
+
+    else:
+        # anything else the saved index is missing (e.g. it is older
+        # than song_vectors) comes from Mongo
+        missing = list(stored_ids.difference(index.song_ids))
+        if missing:
+            print(f"[INFO] Index is missing {len(missing)} stored vectors")
+            index.add(*load_vectors({"song_id": {"$in": missing}}))
+
+    index.save()
+    print(f"[INFO] FAISS index: {len(index)} vectors ({index.meta['factory']})")
+
+    # ---------------- EXISTING RECOMMENDATIONS ----------------
+    # radius: squared distance to a song's TOP_N-th neighbour when its
+    # list was written (missing on lists older than this field)
+    moved = set(dirty_ids).intersection(existing_vec_ids)
+    existing_radius, holders = existing_recommendations(moved)
+    print(f"[INFO] Existing recommendations: {len(existing_radius)}")
+
+    if MODE == "full":
+        print("[WARN] FULL mode: clearing old recommendations")
+        rec_col.delete_many({})
+        existing_radius, holders = {}, set()
+
+    # ---------------- BUILD RECOMMENDATIONS ----------------
+    print("[STEP] Searching nearest neighbors")
+    recs, radii = index.search(final_vectors_new, TOP_N, exclude=dirty_ids)
+    recs = dict(zip(dirty_ids, recs))
+    radius = dict(zip(dirty_ids, radii.tolist()))
+
+    # An older list goes stale when a new or moved song lands inside its
+    # radius (exact for flat / ivf_flat / hnsw; ivf_pq compares
+    # reconstructed codes), or when it lists a song that moved away.
+    older = [sid for sid in index.song_ids if sid in existing_radius and sid not in recs]
+    stale = index.closer_than(older, np.array([existing_radius[sid] for sid in older]), final_vectors_new)
+    stale |= holders.difference(recs)
+
+    todo = [
+        sid for sid in index.song_ids
+        if sid not in recs and (sid not in existing_radius or sid in stale)
+    ]
+    print(f"[INFO] Songs to recommend: {len(recs) + len(todo)} ({len(stale)} stale)")
+
+    for lo in range(0, len(todo), WRITE_CHUNK):
+        chunk = todo[lo:lo + WRITE_CHUNK]
+        found, radii = index.search(index.vectors(chunk), TOP_N, exclude=chunk)
+        recs.update(zip(chunk, found))
+        radius.update(zip(chunk, radii.tolist()))
+
+    print("[STEP] Writing recommendations")
+    rec_ids = list(recs)
+    now = datetime.utcnow()
+    t0 = time.time()
+
+    with BulkWriter(rec_col, batch_size=WRITE_CHUNK) as writer:
+        for lo in range(0, len(rec_ids), WRITE_CHUNK):
+            chunk = rec_ids[lo:lo + WRITE_CHUNK]
+
+            for song_id in chunk:
+                writer.add(UpdateOne(
+                    {"song_id": song_id},
+                    {"$set": {
+                        "song_id": song_id,
+                        "recommended": [{"song_id": sid} for sid in recs[song_id]],
+                        "radius": radius[song_id],
+                        "updated_at": now
+                    }},
+                    upsert=True
+                ), song_id)
+            writer.flush()
+            progress("recommendations", lo + len(chunk), len(rec_ids), t0)
+
+    end_time = time.time()
+    elapsed = round((end_time - start_time) / 60, 2)
+
+    print(f"✅ Hybrid recommender built in {MODE.upper()} mode")
+    print(f"⏱️ Total time: {elapsed} minutes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build song vectors and recommendations")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1,
+        help="audio feature processes (1 = serial)"
+    )
+    parser.add_argument(
+        "--index-type", choices=INDEX_TYPES, default=INDEX_TYPE,
+        help="FAISS index (see benchmarks/ann_indexes.py)"
+    )
+    parser.add_argument(
+        "--vector-format", choices=VECTOR_FORMATS, default=VECTOR_FORMAT,
+        help="song_vectors storage (binary formats are ~3-6x smaller)"
+    )
+    parser.add_argument(
+        "--audio-window", choices=AUDIO_WINDOWS, default=AUDIO_WINDOW,
+        help="decode whole tracks, or only the prime hook / a few excerpts"
+    )
+    args = parser.parse_args()
+
+    run(
+        workers=args.workers,
+        index_type=args.index_type,
+        vector_format=args.vector_format,
+        audio_window=args.audio_window
+    )
@@ -0,0 +1,326 @@
+# Persistent FAISS index for the recommender, so incremental runs only
+# add the new vectors instead of rebuilding from every stored one.
+#
+#   <dir>/songs.index   faiss index, vectors keyed by faiss id
+#   <dir>/ids.npy       song id of each faiss id in it ("" = replaced)
+#   <dir>/keys.npy      those faiss ids, in the same order
+#   <dir>/meta.json     index type, factory string, training set size
+#
+# IVF indexes keep the faiss ids themselves (hashtable direct map), so a
+# changed vector is removed and added again in place; flat and hnsw are
+# wrapped in IndexIDMap2. hnsw can't remove vectors: replaced ones stay
+# in the graph, are left out of searches, and the graph is rebuilt from
+# its own vectors once they are COMPACT_DEAD of it.
+#
+# Files are written to temp names and swapped in with os.replace. A set
+# that doesn't line up (or no longer suits the index type) is treated as
+# missing, and the caller rebuilds.
+
+import json, os, tempfile
+import numpy as np
+import faiss
+
+from shared.feature_cache import CACHE_DIR
+
+
+INDEX_DIR = os.environ.get("WAVEHOOK_INDEX_DIR", os.path.join(CACHE_DIR, "index"))
+
+# flat     exact brute force (default)
+# ivf_flat inverted lists over exact vectors, nprobe lists searched
+# ivf_pq   OPQ rotation to PQ_M * 8 dims + IVF + PQ_M-byte codes
+# hnsw     graph over exact vectors
+# See benchmarks/ann_indexes.py for build time / memory / QPS / recall.
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+INDEX_TYPE = os.environ.get("WAVEHOOK_INDEX_TYPE", "flat")
+
+NPROBE = int(os.environ.get("WAVEHOOK_INDEX_NPROBE", "16"))
+EF_SEARCH = int(os.environ.get("WAVEHOOK_INDEX_EF_SEARCH", "64"))
+PQ_M = 32
+HNSW_M = 32
+
+MIN_TRAIN = 1000       # smaller catalogs always use flat
+RETRAIN_GROWTH = 4     # retrain IVF once the catalog is 4x what it was trained on
+COMPACT_DEAD = 0.25    # rebuild hnsw once a quarter of the graph is replaced vectors
+
+
+def factory_string(kind, n):
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {kind!r}. Use one of {INDEX_TYPES}")
+
+    if kind == "flat" or n < MIN_TRAIN:
+        return "Flat"
+    if kind == "hnsw":
+        return f"HNSW{HNSW_M}"
+
+    # ~4 sqrt(n) lists, with enough training points per centroid
+    nlist = max(1, min(int(4 * np.sqrt(n)), n // 39))
+
+    if kind == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    return f"OPQ{PQ_M}_{PQ_M * 8},IVF{nlist},PQ{PQ_M}"
+
+
+def make_index(kind, vectors):
+    """Empty, trained faiss index of the given kind for these vectors."""
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    index = faiss.index_factory(vectors.shape[1], factory_string(kind, len(vectors)))
+
+    if not index.is_trained:
+        index.train(vectors)
+
+    tune(index)
+    return index
+
+
+def tune(index, nprobe=NPROBE, ef_search=EF_SEARCH):
+    """Search-time knobs (not all survive write_index, so set after loading)."""
+    params = faiss.ParameterSpace()
+    for name, value in (("nprobe", nprobe), ("efSearch", ef_search)):
+        try:
+            params.set_index_parameter(index, name, value)
+        except RuntimeError:
+            pass   # not this kind of index
+
+
+class VectorIndex:
+
+    def __init__(self, directory=INDEX_DIR, kind=INDEX_TYPE):
+        if kind not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type {kind!r}. Use one of {INDEX_TYPES}")
+
+        self.directory = directory
+        self.kind = kind
+        self.index_path = os.path.join(directory, "songs.index")
+        self.ids_path = os.path.join(directory, "ids.npy")
+        self.keys_path = os.path.join(directory, "keys.npy")
+        self.meta_path = os.path.join(directory, "meta.json")
+
+        self.index = None
+        self.mapped = False
+        self.meta = {}
+        self.slots = {}  # faiss id → song id, "" once replaced (hnsw only)
+        self.rows = {}   # song id → faiss id
+        self.next_key = 0
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def song_ids(self):
+        return list(self.rows)
+
+    @property
+    def dim(self):
+        return self.index.d if self.index is not None else None
+
+    # ---------- persistence ----------
+    def load(self, mmap=False):
+        """
+        True when a usable index was loaded. mmap: map the inverted lists
+        of IVF indexes instead of reading them in; faiss maps nothing for
+        flat and hnsw indexes, so those are always read.
+        """
+        paths = (self.index_path, self.ids_path, self.keys_path, self.meta_path)
+        if not all(os.path.exists(p) for p in paths):
+            return False
+
+        try:
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            slots = np.load(self.ids_path, allow_pickle=False).tolist()
+            keys = np.load(self.keys_path, allow_pickle=False).tolist()
+            mmap = mmap and "IVF" in meta.get("factory", "")
+            index = faiss.read_index(self.index_path, faiss.IO_FLAG_MMAP if mmap else 0)
+        except Exception as e:
+            print(f"[WARN] Unreadable FAISS index in {self.directory}: {e}")
+            return False
+
+        rows = {sid: key for key, sid in zip(keys, slots) if sid}
+
+        if index.ntotal != len(keys) or len(keys) != len(slots) or len(rows) != sum(map(bool, slots)):
+            print(f"[WARN] FAISS index has {index.ntotal} rows but {len(slots)} ids")
+            return False
+
+        if meta.get("kind") != self.kind or self.outgrown(meta, len(rows)):
+            print(
+                f"[INFO] Saved {meta.get('kind')} index ({meta.get('factory')}) "
+                f"doesn't suit {self.kind!r} at {len(rows)} vectors"
+            )
+            return False
+
+        tune(index)
+
+        self.index = index
+        self.mapped = mmap
+        self.meta = meta
+        self.slots = dict(zip(keys, slots))
+        self.rows = rows
+        self.next_key = max(keys, default=-1) + 1
+        return True
+
+    def outgrown(self, meta, n):
+        if self.kind == "flat":
+            return False
+        if meta.get("factory") == "Flat":
+            return n >= MIN_TRAIN
+        return self.kind != "hnsw" and n > RETRAIN_GROWTH * meta.get("trained_on", n)
+
+    def save(self):
+        self.compact()
+        os.makedirs(self.directory, exist_ok=True)
+
+        fd, tmp_ids = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, np.array(list(self.slots.values()), dtype=str))
+
+        fd, tmp_keys = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, np.array(list(self.slots), dtype="int64"))
+
+        fd, tmp_index = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        faiss.write_index(self.index, tmp_index)
+
+        fd, tmp_meta = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.meta, f)
+
+        os.replace(tmp_ids, self.ids_path)
+        os.replace(tmp_keys, self.keys_path)
+        os.replace(tmp_index, self.index_path)
+        os.replace(tmp_meta, self.meta_path)
+
+    # ---------- building ----------
+    def build(self, song_ids, vectors):
+        inner = make_index(self.kind, vectors)
+
+        ivf = faiss.try_extract_index_ivf(inner)
+        if ivf is not None:
+            # the IVF keeps the ids, and removes / reconstructs by them
+            ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+            self.index = inner
+        else:
+            self.index = faiss.IndexIDMap2(inner)
+
+        self.mapped = False
+        self.meta = {
+            "kind": self.kind,
+            "factory": factory_string(self.kind, len(vectors)),
+            "trained_on": len(song_ids)
+        }
+        self.slots = {}
+        self.rows = {}
+        self.next_key = 0
+        self.add(song_ids, vectors)
+
+    def compact(self):
+        """Rebuild an hnsw graph without its replaced vectors once they pile up."""
+        dead = len(self.slots) - len(self.rows)
+        if not dead or dead < COMPACT_DEAD * len(self.slots):
+            return
+
+        print(f"[INFO] Compacting FAISS index ({dead} replaced vectors)")
+        song_ids = self.song_ids
+        self.build(song_ids, self.vectors(song_ids))
+
+    def add(self, song_ids, vectors):
+        if not len(song_ids):
+            return
+
+        self.writable()
+
+        keys = list(range(self.next_key, self.next_key + len(song_ids)))
+        self.index.add_with_ids(
+            np.ascontiguousarray(vectors, dtype="float32"),
+            np.array(keys, dtype="int64")
+        )
+
+        self.slots.update(zip(keys, song_ids))
+        self.rows.update(zip(song_ids, keys))
+        self.next_key += len(song_ids)
+
+    def replace(self, song_ids, vectors):
+        """Swap in new vectors for songs already in the index."""
+        if not len(song_ids):
+            return
+
+        self.writable()
+
+        keys = np.array([self.rows.pop(sid) for sid in song_ids], dtype="int64")
+
+        if self.meta["factory"].startswith("HNSW"):
+            # no removal from the graph; search() skips these
+            self.slots.update((key, "") for key in keys.tolist())
+        else:
+            # IDSelectorArray: the IVF hashtable direct map only takes this one
+            self.index.remove_ids(faiss.IDSelectorArray(len(keys), faiss.swig_ptr(keys)))
+            for key in keys.tolist():
+                del self.slots[key]
+
+        self.add(song_ids, vectors)
+
+    def writable(self):
+        if self.mapped:
+            # mapped IVF lists are read-only; read the file in for real
+            self.index = faiss.read_index(self.index_path)
+            self.mapped = False
+            tune(self.index)
+
+    # ---------- querying ----------
+    def vectors(self, song_ids):
+        keys = np.array([self.rows[sid] for sid in song_ids], dtype="int64")
+        return self.index.reconstruct_batch(keys)
+
+    def search(self, vectors, k, exclude=None):
+        """
+        (neighbours, radii): the k nearest song ids per query row and the
+        squared L2 distance to the k-th of them (inf when there are fewer).
+        exclude: one song id per row to leave out of that row's result
+        (the query song itself).
+        """
+        if not len(vectors):
+            return [], np.zeros(0, dtype="float32")
+
+        params = None
+        if len(self.slots) > len(self.rows):
+            dead = np.array([key for key, sid in self.slots.items() if not sid], dtype="int64")
+            params = faiss.SearchParametersHNSW(
+                sel=faiss.IDSelectorNot(faiss.IDSelectorBatch(len(dead), faiss.swig_ptr(dead))),
+                efSearch=EF_SEARCH
+            )
+
+        dists, found = self.index.search(np.ascontiguousarray(vectors, dtype="float32"), k + 1, params=params)
+        exclude = exclude if exclude is not None else [None] * len(found)
+
+        neighbours = []
+        radii = np.full(len(found), np.inf, dtype="float32")
+
+        for r, (row, dist, skip) in enumerate(zip(found, dists, exclude)):
+            # faiss pads with -1 when the index holds fewer than k + 1 songs
+            keep = [(self.slots[j], d) for j, d in zip(row, dist) if j >= 0 and self.slots[j] != skip]
+            keep = keep[:k]
+
+            neighbours.append([sid for sid, _ in keep])
+            if len(keep) == k:
+                radii[r] = keep[-1][1]
+
+        return neighbours, radii
+
+    def closer_than(self, song_ids, radii, vectors, chunk=1000):
+        """
+        The songs (of song_ids, already in the index) that have at least
+        one of `vectors` strictly inside their radius.
+        """
+        if not len(vectors) or not len(song_ids):
+            return set()
+
+        probe = faiss.IndexFlatL2(self.index.d)
+        probe.add(np.ascontiguousarray(vectors, dtype="float32"))
+
+        hits = set()
+        for lo in range(0, len(song_ids), chunk):
+            ids = song_ids[lo:lo + chunk]
+            dist, _ = probe.search(self.vectors(ids), 1)
+            hits.update(sid for sid, d, r in zip(ids, dist[:, 0], radii[lo:lo + chunk]) if d < r)
+
+        return hits
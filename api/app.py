@@ -1,13 +1,12 @@
 from flask import Flask, jsonify, request, render_template, g
 from pymongo import MongoClient
-import random, time, uuid, os
+import random, time, uuid, os, hmac
 import numpy as np
 
-from . import recommend as rec_module
 from .recommend import (
     recommend,
-    load_song_vectors,
-    cosine_similarity_fast
+    recommend_many,
+    get_snapshot
 )
 
 app = Flask(__name__)
@@ -22,6 +21,16 @@ rec_col = db.song_recommendations
 CACHE_TTL = 60 * 60 * 24  # 1 day
 MAX_SESSIONS = 10000       # memory cap for server-side sessions
 
+# /recommend_many is for server-side jobs (digests, playlist autofill).
+# Callers send X-API-Key with one of the comma-separated keys in
+# WAVEHOOK_BATCH_API_KEY (each key is rate limited on its own); with no
+# key set only direct local callers (no proxy in between) are served.
+BATCH_API_KEYS = [k for k in os.environ.get("WAVEHOOK_BATCH_API_KEY", "").split(",") if k]
+# per request (recommend_many itself allows MAX_BATCH_IDS)
+MAX_HTTP_BATCH_IDS = int(os.environ.get("WAVEHOOK_BATCH_MAX_IDS", "500"))
+# seed songs per caller per minute, per API worker (60000 = 1000/s)
+BATCH_IDS_PER_MINUTE = int(os.environ.get("WAVEHOOK_BATCH_IDS_PER_MINUTE", "60000"))
+
 
 # ================ PER-USER SESSION STORE ================
 # Each user gets an isolated session via a cookie-tracked ID.
@@ -32,8 +41,8 @@ SESSIONS = {}  # session_id -> session_data
 
 @app.before_request
 def load_session():
-    # Skip session management for static files
-    if request.path.startswith("/static/"):
+    # Skip session management for static files and bulk (server-to-server) calls
+    if request.path.startswith("/static/") or request.path == "/recommend_many":
         return
 
     sid = request.cookies.get("wavehook_sid")
@@ -72,6 +81,41 @@ def save_session_cookie(response):
     return response
 
 
+# ================ BATCH API ACCESS ================
+
+BATCH_USAGE = {}  # caller -> [(time, seed count), ...] in the last minute
+
+
+def batch_caller():
+    """Caller id for /recommend_many, or None when it isn't allowed."""
+    if BATCH_API_KEYS:
+        key = request.headers.get("X-API-Key", "").encode()
+        # compare against every key so the timing doesn't tell which matched
+        matches = [hmac.compare_digest(key, k.encode()) for k in BATCH_API_KEYS]
+        return f"key{matches.index(True)}" if any(matches) else None
+
+    if request.remote_addr in ("127.0.0.1", "::1") and "X-Forwarded-For" not in request.headers:
+        return "local"
+
+    return None
+
+
+def take_batch_quota(caller, count):
+    """Seconds until count more seeds fit in the caller's minute, 0 = go."""
+    now = time.time()
+
+    usage = [(t, n) for t, n in BATCH_USAGE.get(caller, []) if now - t < 60]
+    used = sum(n for _, n in usage)
+
+    if usage and used + count > BATCH_IDS_PER_MINUTE:
+        BATCH_USAGE[caller] = usage
+        return max(1, int(60 - (now - usage[0][0])) + 1)
+
+    usage.append((now, count))
+    BATCH_USAGE[caller] = usage
+    return 0
+
+
 # ================ INPUT VALIDATION ================
 
 def sanitize_language(lang):
@@ -129,14 +173,16 @@ def update_taste_vector(song_id, weight=1.0):
     if not song_id:
         return
 
-    vectors, song_ids, _, _ = load_song_vectors()
+    snapshot = get_snapshot()
 
-    idx_map = rec_module.SONG_ID_INDEX
-
-    if idx_map is None or song_id not in idx_map:
+    if song_id not in snapshot.index:
         return
 
-    vec = vectors[idx_map[song_id]]
+    vec = snapshot.vector(snapshot.index[song_id])
+
+    # vectors were rebuilt with a different layout since the taste started
+    if g.session["taste_vector"] is not None and len(g.session["taste_vector"]) != len(vec):
+        g.session["taste_vector"] = None
 
     if g.session["taste_vector"] is None:
 
@@ -305,33 +351,13 @@ def recommend_from_taste(language=None):
         return None
 
 
-    vectors, song_ids, norms, langs = load_song_vectors()
-
-    sims = cosine_similarity_fast(
-        vectors,
-        norms,
-        tv
-    )
-
+    snapshot = get_snapshot()
 
-    if sims is None:
+    if len(tv) != snapshot.dim:
         return None
 
-
-    # fast partial sorting
-    n_candidates = min(50, len(sims))
-
-    top_idx = np.argpartition(
-        sims,
-        -n_candidates
-    )[-n_candidates:]
-
-
-    top_idx = top_idx[
-        np.argsort(
-            sims[top_idx]
-        )[::-1]
-    ]
+    # scans only the language's rows, so all 50 are in that language
+    top_idx, _ = snapshot.search(tv, 50, language)
 
 
     # Collect candidate IDs (pre-filter before DB)
@@ -339,7 +365,7 @@ def recommend_from_taste(language=None):
 
     for i in top_idx:
 
-        sid = song_ids[i]
+        sid = snapshot.song_ids[i]
 
         if sid == g.session["primary_song"]:
             continue
@@ -347,10 +373,6 @@ def recommend_from_taste(language=None):
         if is_recently_played(sid):
             continue
 
-        # language filter BEFORE DB call
-        if language and langs[i] != language:
-            continue
-
         candidates.append(sid)
 
         if len(candidates) >= 10:
@@ -597,4 +619,58 @@ def report_action():
     # Update primary to the song the user is currently on
     g.session["primary_song"] = song_id
 
-    return jsonify({"ok": True})
\ No newline at end of file
+    return jsonify({"ok": True})
+
+
+@app.route("/recommend_many", methods=["GET", "POST"])
+def recommend_many_route():
+    """Similar songs for many seed songs at once (digests, playlist autofill).
+
+    GET  /recommend_many?ids=a,b,c&k=5&language=hindi
+    POST /recommend_many  {"song_ids": [...], "k": 5, "language": "hindi"}
+
+    Needs the X-API-Key header (see BATCH_API_KEYS) and is rate limited
+    to BATCH_IDS_PER_MINUTE seed songs per caller.
+    """
+    caller = batch_caller()
+    if caller is None:
+        return jsonify({"error": "forbidden"}), 403
+
+    body = request.get_json(silent=True) if request.method == "POST" else None
+    if not isinstance(body, dict):
+        body = {}
+
+    song_ids = body.get("song_ids")
+    if song_ids is None:
+        song_ids = [sid for sid in request.args.get("ids", "").split(",") if sid]
+
+    if not isinstance(song_ids, list) or not song_ids:
+        return jsonify({"error": "missing song_ids"}), 400
+
+    if len(song_ids) > MAX_HTTP_BATCH_IDS:
+        return jsonify({"error": f"at most {MAX_HTTP_BATCH_IDS} song_ids per request"}), 400
+
+    try:
+        k = int(body.get("k", request.args.get("k", 5)))
+    except (TypeError, ValueError):
+        return jsonify({"error": "k must be an integer"}), 400
+    k = max(1, min(k, 100))
+
+    language = body.get("language") or request.args.get("language")
+    if language is not None and not isinstance(language, str):
+        return jsonify({"error": "language must be a string"}), 400
+    language = sanitize_language(language)
+
+    retry_after = take_batch_quota(caller, len(song_ids))
+    if retry_after:
+        response = jsonify({"error": "rate limit exceeded"})
+        response.headers["Retry-After"] = str(retry_after)
+        return response, 429
+
+    song_ids = [str(sid) for sid in song_ids]
+    results = recommend_many(song_ids, k=k, language=language)
+
+    return jsonify({
+        "recommendations": results,
+        "missing": [sid for sid in song_ids if sid not in results]
+    })
@@ -1,8 +1,12 @@
 import os
 import time
+import threading
 import numpy as np
 from pymongo import MongoClient
 
+from shared.vector_codec import VectorStack, VECTOR_FIELDS
+from . import snapshot_store
+
 # -----------------------------
 # MongoDB Connection
 # -----------------------------
@@ -13,132 +17,393 @@ vectors_collection = db.song_vectors
 
 
 # -----------------------------
-# In-memory cache
+# In-memory snapshot
 # -----------------------------
-VECTORS = None
-SONG_IDS = None
-NORMS = None
-SONG_ID_INDEX = None  # song_id → index lookup (O(1))
-LANGUAGES = None      # language cache
+VECTOR_CACHE_TTL = 60 * 60  # 1 hour — background refresh picks up new songs
+REFRESH_RETRY = 60          # seconds before retrying a refresh that failed
+
+# Precision of the serving matrix (unit-normalized rows):
+#   float32  4 bytes / value (default)
+#   float16  2 bytes / value
+#   int8     1 byte / value + one float32 scale per dimension
+# See benchmarks/serving_precision.py for latency and top-k agreement.
+SERVING_PRECISIONS = ("float32", "float16", "int8")
+SERVING_PRECISION = os.environ.get("WAVEHOOK_SERVING_PRECISION", "float32")
+
+SIM_CHUNK_ROWS = 1024   # rows upcast to float32 at a time (float16 / int8), cache-sized
+
+# recommend_many: catalog rows per matrix-matrix product, and the most
+# query vectors multiplied at once (bounds the similarity block to
+# BATCH_QUERIES x BATCH_ROWS floats = 64 MB)
+BATCH_ROWS = 16384
+BATCH_QUERIES = 1024
+MAX_BATCH_IDS = 10000   # per recommend_many call / HTTP request
+
+# Shared snapshot (see snapshot_store.py): when set, workers map the
+# exported files instead of each reading song_vectors. Whichever worker
+# finds the export missing or older than VECTOR_CACHE_TTL re-exports it.
+SNAPSHOT_DIR = os.environ.get("WAVEHOOK_SNAPSHOT_DIR")
+MANIFEST_POLL = 10      # seconds between manifest checks per worker
+
+
+def quantize(unit, precision=SERVING_PRECISION):
+    """(rows, per-dimension scales or None) for unit-normalized float32 rows."""
+    if precision == "float32":
+        return unit, None
+    if precision == "float16":
+        return unit.astype(np.float16), None
+    if precision != "int8":
+        raise ValueError(f"Unknown serving precision {precision!r}. Use one of {SERVING_PRECISIONS}")
+
+    # per dimension: the blocks (TF-IDF, audio, hook, popularity) have
+    # very different ranges, a per-row scale would flatten the small ones
+    scales = np.abs(unit).max(axis=0) / 127.0
+    scales[scales == 0] = 1.0
+    rows = np.empty(unit.shape, dtype=np.int8)
+    for lo in range(0, len(unit), SIM_CHUNK_ROWS):
+        rows[lo:lo + SIM_CHUNK_ROWS] = np.rint(unit[lo:lo + SIM_CHUNK_ROWS] / scales)
+    return rows, scales.astype(np.float32)
+
+
+class VectorSnapshot:
+    """
+    One consistent, read-only view of song_vectors. Never modified after
+    construction: a refresh builds a new snapshot and swaps the reference,
+    so a request that grabbed one keeps a matching set of arrays.
+
+    Rows are stored unit-normalized (zero vectors stay zero), so cosine
+    similarity against the whole catalog is one matrix-vector product.
+    They are grouped by language into contiguous blocks, so a
+    language-filtered query only scans that language's rows.
+    """
+
+    __slots__ = ("rows", "scales", "norms", "song_ids", "index", "languages", "blocks", "loaded_at", "version")
+
+    def __init__(self, rows, scales, norms, song_ids, blocks, loaded_at, version=None):
+        """Prepared arrays (see from_vectors); version: the export they came from."""
+        for arr in (rows, scales, norms):
+            if arr is not None:
+                arr.setflags(write=False)
+
+        languages = [None] * len(song_ids)
+        for lang, (lo, hi) in blocks.items():
+            languages[lo:hi] = [lang] * (hi - lo)
+
+        self.rows = rows
+        self.scales = scales
+        self.norms = norms
+        self.song_ids = tuple(song_ids)
+        self.index = {sid: i for i, sid in enumerate(song_ids)}  # song_id → row (O(1))
+        self.languages = tuple(languages)
+        self.blocks = blocks
+        self.loaded_at = loaded_at
+        self.version = version
+
+    @classmethod
+    def from_vectors(cls, vectors, song_ids, languages, loaded_at, precision=SERVING_PRECISION):
+        """vectors: raw float32 matrix, normalized in place."""
+        # ---------- language blocks ----------
+        order = sorted(range(len(song_ids)), key=lambda i: (languages[i] is None, languages[i] or ""))
+        if order != list(range(len(order))):
+            vectors = vectors[order]
+            song_ids = [song_ids[i] for i in order]
+            languages = [languages[i] for i in order]
+
+        blocks = {}   # language → (first row, end row)
+        for i, lang in enumerate(languages):
+            lo, _ = blocks.get(lang, (i, i))
+            blocks[lang] = (lo, i + 1)
+
+        norms = np.linalg.norm(vectors, axis=1)
+        vectors /= np.maximum(norms, 1e-10)[:, None]
+
+        rows, scales = quantize(vectors, precision)
+        return cls(rows, scales, norms, song_ids, blocks, loaded_at)
+
+    def __len__(self):
+        return len(self.song_ids)
+
+    @property
+    def dim(self):
+        return self.rows.shape[1]
+
+    @property
+    def nbytes(self):
+        return self.rows.nbytes + self.norms.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def age(self):
+        return time.time() - self.loaded_at
+
+    def unit(self, rows):
+        """float32 unit rows (a slice or an array of row numbers)."""
+        out = self.rows[rows].astype(np.float32, copy=False)
+        if self.scales is not None:
+            out = out * self.scales
+        return out
+
+    def vector(self, row):
+        """The stored vector of one row (dequantized), for taste vectors."""
+        return self.unit(slice(row, row + 1))[0] * self.norms[row]
+
+    def rows_of(self, language=None):
+        """(lo, hi) rows to scan: one language's block, or everything."""
+        if not language:
+            return 0, len(self)
+        return self.blocks.get(language, (0, 0))
+
+    def similarities(self, query, lo=0, hi=None):
+        """
+        Cosine similarity of query against rows lo:hi (default: all);
+        None for a zero query.
+        """
+        hi = len(self) if hi is None else hi
+        q = np.asarray(query, dtype=np.float32)
+        q_norm = np.linalg.norm(q)
+
+        if q_norm == 0:
+            return None
+
+        q = q / q_norm
+
+        if self.rows.dtype == np.float32:
+            return self.rows[lo:hi] @ q
+
+        if self.scales is not None:
+            q = q * self.scales   # (rows * scales) @ q == rows @ (scales * q)
+
+        # float16 / int8: upcast a chunk at a time, never the whole matrix
+        sims = np.empty(hi - lo, dtype=np.float32)
+        for start in range(lo, hi, SIM_CHUNK_ROWS):
+            chunk = self.rows[start:min(start + SIM_CHUNK_ROWS, hi)]
+            sims[start - lo:start - lo + len(chunk)] = chunk.astype(np.float32) @ q
+
+        return sims
+
+    def search(self, query, n, language=None):
+        """
+        (rows, similarities) of the n rows most similar to query, best
+        first, only from `language` when given. Fewer than n only when the
+        language has fewer rows; empty for a zero query.
+        """
+        lo, hi = self.rows_of(language)
+        sims = self.similarities(query, lo, hi)
+
+        if sims is None or not len(sims):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        # argpartition O(n), then sort only the candidates
+        n = min(n, len(sims))
+        top = np.argpartition(sims, -n)[-n:]
+        top = top[np.argsort(sims[top])[::-1]]
+
+        return top + lo, sims[top]
+
+    def search_many(self, queries, n, language=None):
+        """
+        search() for a (q, dim) matrix of queries at once: (rows, sims),
+        both (q, n) and best first. The catalog is streamed in blocks of
+        BATCH_ROWS, each multiplied against all queries and reduced to a
+        running top n per query, so no (q, catalog) matrix is built.
+        Zero queries get similarity 0 everywhere.
+        """
+        lo, hi = self.rows_of(language)
+        n = min(n, hi - lo)
+
+        q = np.asarray(queries, dtype=np.float32)
+        q = q / np.maximum(np.linalg.norm(q, axis=1), 1e-10)[:, None]
+        if self.scales is not None:
+            q = q * self.scales   # (rows * scales) @ q == rows @ (scales * q)
+
+        best_rows = np.zeros((len(q), 0), dtype=np.int64)
+        best_sims = np.zeros((len(q), 0), dtype=np.float32)
+
+        for start in range(lo, hi, BATCH_ROWS):
+            # upcast float16 / int8 once per block, reused by every query
+            block = self.rows[start:min(start + BATCH_ROWS, hi)].astype(np.float32, copy=False)
+            m = min(n, len(block))
+
+            block_rows = np.empty((len(q), m), dtype=np.int64)
+            block_sims = np.empty((len(q), m), dtype=np.float32)
+
+            for qs in range(0, len(q), BATCH_QUERIES):
+                sims = q[qs:qs + BATCH_QUERIES] @ block.T
+                top = np.argpartition(sims, -m, axis=1)[:, -m:]
+                block_rows[qs:qs + len(top)] = top + start
+                block_sims[qs:qs + len(top)] = np.take_along_axis(sims, top, axis=1)
+
+            best_rows = np.hstack((best_rows, block_rows))
+            best_sims = np.hstack((best_sims, block_sims))
+
+            if best_sims.shape[1] > n:
+                keep = np.argpartition(best_sims, -n, axis=1)[:, -n:]
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+                best_sims = np.take_along_axis(best_sims, keep, axis=1)
+
+        order = np.argsort(-best_sims, axis=1, kind="stable")
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_sims, order, axis=1)
+
+
+_snapshot = None
+_load_lock = threading.Lock()   # one cold load at a time
+_refresh_lock = threading.Lock() # held while a background rebuild runs
+_polled_at = 0.0
+_failed_at = 0.0   # last failed background rebuild
+
+
+def build_snapshot():
+    """Read song_vectors into a new VectorSnapshot (the slow part)."""
+    song_ids = []
+    languages = []
 
-_vectors_loaded_at = 0
-VECTOR_CACHE_TTL = 60 * 60  # 1 hour — auto-refresh picks up new songs
+    # both storage formats (see shared/vector_codec.py) decode straight
+    # into one preallocated float32 matrix
+    stack = VectorStack(vectors_collection.estimated_document_count())
 
+    cursor = vectors_collection.find(
+        {
+            "vector": {"$exists": True},
+            "language": {"$exists": True}
+        },
+        {"_id": 0, "song_id": 1, "language": 1, **VECTOR_FIELDS}
+    )
 
-# -----------------------------
-# Load vectors ONCE (with TTL refresh)
-# -----------------------------
-def load_song_vectors():
-    global VECTORS, SONG_IDS, NORMS, SONG_ID_INDEX, LANGUAGES, _vectors_loaded_at
+    for doc in cursor:
+        if not stack.append(doc):
+            continue
 
-    now = time.time()
+        song_ids.append(str(doc.get("song_id")))
+        languages.append(doc.get("language"))
 
-    # already loaded and still fresh → reuse
-    if VECTORS is not None and (now - _vectors_loaded_at) < VECTOR_CACHE_TTL:
-        return VECTORS, SONG_IDS, NORMS, LANGUAGES
+    if not song_ids:
+        raise RuntimeError("No vectors found in song_vectors collection")
 
-    vectors = []
-    song_ids = []
-    languages = []
+    snapshot = VectorSnapshot.from_vectors(stack.matrix(), song_ids, languages, time.time())
+    print(
+        f"[recommend] Loaded {len(snapshot)} vectors into RAM "
+        f"({snapshot.rows.dtype}, {snapshot.nbytes / 2 ** 20:.1f} MB)"
+    )
+    return snapshot
 
-    cursor = vectors_collection.find({
-        "vector": {"$exists": True},
-        "language": {"$exists": True}
-    })
 
-    for doc in cursor:
-        vec = doc.get("vector")
-        sid = str(doc.get("song_id"))
-        lang = doc.get("language")
+def get_snapshot():
+    """
+    The current snapshot. Only the very first call waits for the load;
+    after that a stale snapshot keeps being served while a background
+    thread builds its replacement.
+    """
+    global _snapshot
 
-        if vec is None:
-            continue
+    snapshot = _snapshot
 
-        vectors.append(vec)
-        song_ids.append(sid)
-        languages.append(lang)
+    if snapshot is None:
+        with _load_lock:
+            if _snapshot is None:
+                _snapshot = load_snapshot()
+            return _snapshot
 
-    if not vectors:
-        raise RuntimeError("No vectors found in song_vectors collection")
+    # after a failed rebuild, don't start another full read on every request
+    if time.time() - _failed_at >= REFRESH_RETRY and is_stale(snapshot):
+        refresh_vectors()
 
-    VECTORS = np.array(vectors, dtype="float32")
+    return snapshot
 
-    # precompute norms once
-    NORMS = np.linalg.norm(VECTORS, axis=1)
 
-    SONG_IDS = song_ids
-    LANGUAGES = languages
+def load_snapshot(current=None, wait=True):
+    """
+    A new snapshot: from Mongo, or from the shared export when
+    SNAPSHOT_DIR is set (exporting first if it is missing or expired).
+    current is returned as is when the export hasn't changed.
+    wait=False: don't queue behind another process's export.
+    """
+    if not SNAPSHOT_DIR:
+        return build_snapshot()
 
-    # Perf: build O(1) lookup dict
-    SONG_ID_INDEX = {sid: i for i, sid in enumerate(song_ids)}
+    manifest = snapshot_store.read_manifest(SNAPSHOT_DIR)
 
-    _vectors_loaded_at = now
+    if manifest is None or expired(manifest):
+        with snapshot_store.export_lock(SNAPSHOT_DIR, wait) as locked:
+            if locked:
+                # another worker may have exported while we waited
+                manifest = snapshot_store.read_manifest(SNAPSHOT_DIR)
+                if manifest is None or expired(manifest):
+                    manifest = snapshot_store.export_snapshot(build_snapshot(), SNAPSHOT_DIR)
 
-    print(f"[recommend] Loaded {len(SONG_IDS)} vectors into RAM")
+    if manifest is None:
+        raise RuntimeError(f"No exported snapshot in {SNAPSHOT_DIR}")
 
-    return VECTORS, SONG_IDS, NORMS, LANGUAGES
+    if current is not None and current.version == manifest["version"]:
+        return current
 
+    snapshot = VectorSnapshot(
+        *snapshot_store.open_files(SNAPSHOT_DIR, manifest),
+        loaded_at=manifest["created_at"],
+        version=manifest["version"]
+    )
+    print(f"[recommend] Mapped snapshot {snapshot.version} ({len(snapshot)} vectors)")
+    return snapshot
 
-# -----------------------------
-# Fast cosine similarity
-# -----------------------------
-def cosine_similarity_fast(vectors, norms, query_vector):
 
-    q = np.array(query_vector, dtype="float32")
-    q_norm = np.linalg.norm(q)
+def expired(manifest):
+    return time.time() - manifest["created_at"] >= VECTOR_CACHE_TTL
 
-    if q_norm == 0:
-        return None
 
-    # Guard against zero-norm vectors to prevent Inf/NaN
-    safe_norms = np.maximum(norms, 1e-10)
+def is_stale(snapshot):
+    """Time to refresh: TTL passed, or (shared) a new export / expired one."""
+    global _polled_at
 
-    return np.dot(vectors, q) / (safe_norms * q_norm)
+    if not SNAPSHOT_DIR:
+        return snapshot.age() >= VECTOR_CACHE_TTL
 
+    now = time.time()
+    if now - _polled_at < MANIFEST_POLL:
+        return False
+    _polled_at = now
 
-# -----------------------------
-# Recommend similar songs
-# -----------------------------
-def recommend(song_id, k=5, language=None):
+    manifest = snapshot_store.read_manifest(SNAPSHOT_DIR)
+    return manifest is None or manifest["version"] != snapshot.version or expired(manifest)
 
-    vectors, song_ids, norms, langs = load_song_vectors()
 
-    if song_id not in SONG_ID_INDEX:
-        raise ValueError(f"Song ID {song_id} not found in song_vectors")
+def _refresh():
+    global _snapshot, _failed_at
 
-    idx = SONG_ID_INDEX[song_id]
-    query_vector = vectors[idx]
+    try:
+        _snapshot = load_snapshot(_snapshot, wait=False)   # single reference swap
+    except Exception as e:
+        _failed_at = time.time()
+        print(
+            f"[recommend] Vector refresh failed, keeping the old snapshot "
+            f"(retrying in {REFRESH_RETRY}s): {e}"
+        )
+    finally:
+        _refresh_lock.release()
 
-    sims = cosine_similarity_fast(vectors, norms, query_vector)
 
-    if sims is None:
-        return []
+# -----------------------------
+# Recommend similar songs
+# -----------------------------
+def recommend(song_id, k=5, language=None):
 
-    # use argpartition O(n)
-    n_candidates = min(k + 50, len(sims))
+    snapshot = get_snapshot()
 
-    top_idx = np.argpartition(sims, -n_candidates)[-n_candidates:]
+    if song_id not in snapshot.index:
+        raise ValueError(f"Song ID {song_id} not found in song_vectors")
 
-    # sort only candidates
-    top_idx = top_idx[np.argsort(sims[top_idx])[::-1]]
+    # only the language's block is scanned; one extra for the song itself
+    rows, sims = snapshot.search(snapshot.vector(snapshot.index[song_id]), k + 1, language)
 
     recommendations = []
 
-    for i in top_idx:
+    for i, sim in zip(rows, sims):
 
-        rec_id = song_ids[i]
+        rec_id = snapshot.song_ids[i]
 
         # skip self
         if rec_id == song_id:
             continue
 
-        # IMPORTANT: filter by language BEFORE DB call
-        if language and langs[i] != language:
-            continue
-
         recommendations.append({
             "song_id": rec_id,
-            "similarity": float(sims[i])
+            "similarity": float(sim)
         })
 
         if len(recommendations) >= k:
@@ -147,16 +412,58 @@ def recommend(song_id, k=5, language=None):
     return recommendations
 
 
+def recommend_many(song_ids, k=5, language=None):
+    """
+    recommend() for many seed songs in one pass over the catalog.
+    Returns {song_id: [{"song_id", "similarity"}, ...]}; ids that have
+    no vector are left out.
+    """
+    if len(song_ids) > MAX_BATCH_IDS:
+        raise ValueError(f"At most {MAX_BATCH_IDS} song ids per call, got {len(song_ids)}")
+
+    snapshot = get_snapshot()
+
+    seeds = [sid for sid in dict.fromkeys(song_ids) if sid in snapshot.index]
+    if not seeds:
+        return {}
+
+    idx = np.array([snapshot.index[sid] for sid in seeds], dtype=np.int64)
+    queries = snapshot.unit(idx)
+
+    # one extra for the seed itself
+    rows, sims = snapshot.search_many(queries, k + 1, language)
+
+    results = {}
+
+    for seed, q, seed_rows, seed_sims in zip(seeds, queries, rows, sims):
+
+        # zero vector: nothing is similar (recommend() returns [] too)
+        if not q.any():
+            results[seed] = []
+            continue
+
+        recs = [
+            {"song_id": snapshot.song_ids[i], "similarity": float(sim)}
+            for i, sim in zip(seed_rows, seed_sims)
+            if snapshot.song_ids[i] != seed
+        ]
+        results[seed] = recs[:k]
+
+    return results
+
+
 # -----------------------------
 # Optional manual refresh
 # -----------------------------
-def refresh_vectors():
-
-    global VECTORS, SONG_IDS, NORMS, SONG_ID_INDEX, LANGUAGES, _vectors_loaded_at
-
-    VECTORS = None
-    SONG_IDS = None
-    NORMS = None
-    SONG_ID_INDEX = None
-    LANGUAGES = None
-    _vectors_loaded_at = 0
\ No newline at end of file
+def refresh_vectors(wait=False):
+    """
+    Rebuild the snapshot in a background thread; requests keep using the
+    current one until the new one is swapped in. wait: block until done.
+    """
+    if not _refresh_lock.acquire(blocking=False):
+        return   # already rebuilding
+    worker = threading.Thread(target=_refresh, name="vector-refresh", daemon=True)
+    worker.start()
+
+    if wait:
+        worker.join()
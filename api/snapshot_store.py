@@ -0,0 +1,131 @@
+# Versioned on-disk copy of the serving snapshot (see recommend.py), so
+# API worker processes np.load it with mmap_mode="r" and share one copy
+# of the matrix through the OS page cache instead of each pulling
+# song_vectors from Mongo into private memory.
+#
+#   <dir>/manifest.json       current version + row blocks per language
+#   <dir>/<version>/rows.npy  unit rows (float32 / float16 / int8)
+#   <dir>/<version>/scales.npy   int8 only
+#   <dir>/<version>/norms.npy
+#   <dir>/<version>/song_ids.npy
+#
+# A version directory is complete before the manifest points at it
+# (os.replace), and is never modified afterwards. Workers watch the
+# manifest and swap to a new version when it changes.
+#
+#   python -m api.snapshot_store /srv/wavehook/snapshot   # export from Mongo now
+
+import contextlib, fcntl, json, os, shutil, sys, tempfile, time
+import numpy as np
+
+
+MANIFEST = "manifest.json"
+KEEP_VERSIONS = 3      # older versions are deleted (open maps stay valid)
+
+
+def read_manifest(directory):
+    """The current manifest, or None when nothing was exported yet."""
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+@contextlib.contextmanager
+def export_lock(directory, wait=True):
+    """
+    Yields True while holding the directory's export lock (one exporting
+    process at a time), False when wait=False and another process has it.
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    with open(os.path.join(directory, ".lock"), "w") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def export_snapshot(snapshot, directory):
+    """Write snapshot as a new version and point the manifest at it."""
+    os.makedirs(directory, exist_ok=True)
+
+    now = time.time_ns()
+    version = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now // 10 ** 9)) + f".{now % 10 ** 9:09d}"
+    tmp = tempfile.mkdtemp(dir=directory, prefix=".tmp-")
+
+    np.save(os.path.join(tmp, "rows.npy"), snapshot.rows)
+    np.save(os.path.join(tmp, "norms.npy"), snapshot.norms)
+    np.save(os.path.join(tmp, "song_ids.npy"), np.array(snapshot.song_ids, dtype=str))
+    if snapshot.scales is not None:
+        np.save(os.path.join(tmp, "scales.npy"), snapshot.scales)
+
+    os.rename(tmp, os.path.join(directory, version))
+
+    manifest = {
+        "version": version,
+        "created_at": snapshot.loaded_at,
+        "count": len(snapshot),
+        "dim": snapshot.dim,
+        "dtype": str(snapshot.rows.dtype),
+        "scales": snapshot.scales is not None,
+        # [language, first row, end row]; JSON keys can't be null
+        "blocks": [[lang, lo, hi] for lang, (lo, hi) in snapshot.blocks.items()],
+    }
+
+    fd, tmp_manifest = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_manifest, os.path.join(directory, MANIFEST))
+
+    prune(directory, version)
+
+    print(f"[snapshot] Exported {manifest['count']} vectors as {version}")
+    return manifest
+
+
+def prune(directory, current):
+    versions = sorted(
+        name for name in os.listdir(directory)
+        if not name.startswith(".") and os.path.isdir(os.path.join(directory, name))
+    )
+
+    for name in versions[:-KEEP_VERSIONS]:
+        if name != current:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+def open_files(directory, manifest):
+    """
+    rows / norms / scales memory-mapped read-only, song ids read in.
+    Returns (rows, scales, norms, song_ids, blocks).
+    """
+    path = os.path.join(directory, manifest["version"])
+
+    def mapped(name):
+        # plain ndarray view of the map (np.memmap results are memmaps too)
+        return np.load(os.path.join(path, name), mmap_mode="r").view(np.ndarray)
+
+    rows = mapped("rows.npy")
+    norms = mapped("norms.npy")
+    scales = mapped("scales.npy") if manifest["scales"] else None
+    song_ids = np.load(os.path.join(path, "song_ids.npy")).tolist()
+    blocks = {lang: (lo, hi) for lang, lo, hi in manifest["blocks"]}
+
+    return rows, scales, norms, song_ids, blocks
+
+
+if __name__ == "__main__":
+    from api.recommend import build_snapshot
+
+    directory = sys.argv[1] if len(sys.argv) > 1 else os.environ["WAVEHOOK_SNAPSHOT_DIR"]
+
+    with export_lock(directory):
+        export_snapshot(build_snapshot(), directory)
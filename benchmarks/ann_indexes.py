@@ -0,0 +1,162 @@
+# Compare the recommender's FAISS index types: build time, memory,
+# queries per second and recall@10 against exact (flat) search.
+#
+#   python benchmarks/ann_indexes.py                        # synthetic
+#   python benchmarks/ann_indexes.py --sizes 10000 200000
+#   python benchmarks/ann_indexes.py --npy vectors.npy      # real vectors
+#   python benchmarks/ann_indexes.py --mongo                # song_vectors (MONGO_URI)
+#   python benchmarks/ann_indexes.py --nprobe 8 16 64 --ef-search 32 128
+#
+# Queries are catalog rows, like the recommender's own searches.
+
+import argparse, json, os, sys, time
+import numpy as np
+import faiss
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "Recommendation"))
+
+from vector_index import INDEX_TYPES, factory_string, make_index, tune
+
+
+K = 10
+
+
+# ----------------------------
+# Vector sets
+# ----------------------------
+def synthetic_vectors(n, dim=1017, clusters=200, seed=0):
+    """Clustered non-negative vectors, roughly shaped like the hybrid ones."""
+    rng = np.random.default_rng(seed)
+    centers = rng.random((clusters, dim), dtype=np.float32) * (rng.random((clusters, dim)) < 0.05)
+    labels = rng.integers(0, clusters, n)
+    noise = rng.standard_normal((n, dim), dtype=np.float32) * 0.05
+    return np.abs(centers[labels] + noise).astype("float32")
+
+
+def mongo_vectors():
+    from pymongo import MongoClient
+    from shared.vector_codec import VectorStack, VECTOR_FIELDS
+
+    col = MongoClient(os.environ["MONGO_URI"]).musicdb.song_vectors
+    stack = VectorStack(col.estimated_document_count())
+    for doc in col.find({"vector": {"$exists": True}}, {"_id": 0, **VECTOR_FIELDS}):
+        stack.append(doc)
+    return stack.matrix()
+
+
+def vector_sets(args):
+    if args.npy:
+        yield os.path.basename(args.npy), np.load(args.npy).astype("float32")
+    if args.mongo:
+        yield "song_vectors", mongo_vectors()
+    if not (args.npy or args.mongo):
+        for n in args.sizes:
+            yield f"synthetic_{n}", synthetic_vectors(n, args.dim)
+
+
+# ----------------------------
+# Measurements
+# ----------------------------
+def build(kind, vectors):
+    t0 = time.perf_counter()
+    index = make_index(kind, vectors)
+    index.add(vectors)
+    return index, time.perf_counter() - t0
+
+
+def search(index, queries, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        _, found = index.search(queries, K)
+        best = min(best, time.perf_counter() - t0)
+    return found, len(queries) / best
+
+
+def recall(found, truth):
+    hits = sum(len(np.intersect1d(f, t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def configs(kind, args):
+    """(label, nprobe, efSearch) search settings to try for one index type."""
+    if kind in ("ivf_flat", "ivf_pq"):
+        return [(f"nprobe={p}", p, None) for p in args.nprobe]
+    if kind == "hnsw":
+        return [(f"efSearch={e}", None, e) for e in args.ef_search]
+    return [("", None, None)]
+
+
+def bench_set(name, vectors, args):
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)]
+
+    flat, _ = build("flat", vectors)
+    truth, _ = search(flat, queries)
+    del flat
+
+    rows = []
+    for kind in args.kinds:
+        index, build_s = build(kind, vectors)
+        memory = faiss.serialize_index(index).nbytes
+
+        for label, nprobe, ef_search in configs(kind, args):
+            tune(index, **{k: v for k, v in (("nprobe", nprobe), ("ef_search", ef_search)) if v})
+            found, qps = search(index, queries)
+
+            rows.append({
+                "set": name,
+                "n": len(vectors),
+                "dim": vectors.shape[1],
+                "index": kind,
+                "factory": factory_string(kind, len(vectors)),
+                "params": label,
+                "build_s": round(build_s, 2),
+                "memory_mb": round(memory / 2 ** 20, 1),
+                "qps": round(qps, 1),
+                f"recall@{K}": round(recall(found, truth), 4),
+            })
+            print_row(rows[-1])
+
+    return rows
+
+
+def print_row(r):
+    print(
+        f"{r['set']:<20}{r['index']:<10}{r['params']:<14}{r['build_s']:>9}"
+        f"{r['memory_mb']:>11}{r['qps']:>11}{r[f'recall@{K}']:>11}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--dim", type=int, default=1017, help="synthetic vector size")
+    parser.add_argument("--npy", help="real vectors saved with np.save")
+    parser.add_argument("--mongo", action="store_true", help="load song_vectors from MONGO_URI")
+    parser.add_argument("--kinds", nargs="+", choices=INDEX_TYPES, default=list(INDEX_TYPES))
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[16])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[64])
+    parser.add_argument("--threads", type=int, help="faiss OpenMP threads (default: all)")
+    parser.add_argument("--json", help="write results here")
+    args = parser.parse_args()
+
+    if args.threads:
+        faiss.omp_set_num_threads(args.threads)
+
+    print(f"{'set':<20}{'index':<10}{'params':<14}{'build s':>9}{'memory MB':>11}{'QPS':>11}{f'recall@{K}':>11}")
+
+    results = []
+    for name, vectors in vector_sets(args):
+        results += bench_set(name, vectors, args)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
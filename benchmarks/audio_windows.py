@@ -0,0 +1,119 @@
+# Compare the recommender's audio block from whole tracks vs hook windows
+# (AUDIO_WINDOW=hook): per-song decode + feature time, and how far the
+# windowed features drift from the full-track ones.
+#
+#   python benchmarks/audio_windows.py                       # synthetic tracks
+#   python benchmarks/audio_windows.py --lengths 120 600
+#   python benchmarks/audio_windows.py a.mp4 b.mp4           # real files (no hook → excerpts)
+#   python benchmarks/audio_windows.py --json out.json
+
+import argparse, json, os, sys, tempfile, time, warnings
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from shared.fetcher import decode_audio, decode_windows
+from shared.audio_features import audio_windows, signal_features, slice_windows
+from synthetic import make_track, encode
+
+warnings.simplefilter("ignore", FutureWarning)   # librosa.beat.tempo
+
+
+def features(data, windows, repeat):
+    """(best seconds, feature vector) for decode + features of one song."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        if windows:
+            y, sr = decode_windows(data, windows)
+        else:
+            y, sr = decode_audio(data)
+        feats = signal_features(y, sr)
+        best = min(best, time.perf_counter() - t0)
+    return best, feats
+
+
+def check_handoff(data, windows):
+    """The hook stage slices its full decode; it must match decode_windows."""
+    y, sr = decode_audio(data)
+    expected = slice_windows(y, sr, windows)
+    got, _ = decode_windows(data, windows)
+    assert np.array_equal(got, expected), \
+        f"decode_windows differs from the sliced full decode ({len(got)} vs {len(expected)} samples)"
+
+
+def drift(feats, base):
+    """Per-feature drift of the windowed block from the full-track one."""
+    rel = lambda a, b: float(np.linalg.norm(a - b) / max(np.linalg.norm(b), 1e-9))
+    return {
+        "tempo_bpm": round(abs(float(feats[0] - base[0])), 2),
+        "centroid_rel": round(rel(feats[1:2], base[1:2]), 4),
+        "mfcc_rel": round(rel(feats[2:], base[2:]), 4),
+        "block_rel": round(rel(feats, base), 4),
+        "block_cos": round(float(feats @ base / max(np.linalg.norm(feats) * np.linalg.norm(base), 1e-9)), 4),
+    }
+
+
+def tracks(args, tmp):
+    """(name, path, hook start or None, duration) per test track."""
+    if args.files:
+        for path in args.files:
+            out = decode_audio(open(path, "rb").read(), sr=8000)
+            yield os.path.basename(path), path, None, len(out[0]) / out[1]
+        return
+
+    sr = 44100
+    for i, seconds in enumerate(args.lengths):
+        y, chorus = make_track(seconds, sr=sr, seed=i)
+        path = encode(y, sr, os.path.join(tmp, f"synthetic_{seconds}s.mp4"))
+        yield f"synthetic_{seconds}s", path, float(chorus[0]), float(seconds)
+        yield f"synthetic_{seconds}s/nohook", path, None, float(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="*", help="audio files (default: synthetic)")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[120, 240, 480])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="write per-track results here")
+    args = parser.parse_args()
+
+    print(f"{'track':<26}{'windows':>9}{'full s':>9}{'window s':>10}{'speedup':>9}"
+          f"{'tempo':>8}{'centroid':>10}{'mfcc':>8}{'cos':>8}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, path, hook, duration in tracks(args, tmp):
+            with open(path, "rb") as f:
+                data = f.read()
+
+            windows = audio_windows(hook, duration)
+            full_s, base = features(data, None, args.repeat)
+            window_s, feats = features(data, windows, args.repeat) if windows else (full_s, base)
+            if windows:
+                check_handoff(data, windows)
+
+            r = {
+                "track": name,
+                "duration_s": round(duration, 1),
+                "windows": windows,
+                "full_s": round(full_s, 3),
+                "window_s": round(window_s, 3),
+                "speedup": round(full_s / window_s, 2),
+                **drift(feats, base),
+            }
+            results.append(r)
+
+            print(
+                f"{name:<26}{len(windows or []):>9}{r['full_s']:>9}{r['window_s']:>10}{r['speedup']:>9}"
+                f"{r['tempo_bpm']:>8}{r['centroid_rel']:>10}{r['mfcc_rel']:>8}{r['block_cos']:>8}"
+            )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Throughput of recommend_many's batched search (one matrix-matrix pass
+# over the catalog for all seeds) against one search() per seed, as a
+# digest / playlist job looping over recommend() would do.
+#
+#   python benchmarks/batch_recommend.py                        # synthetic
+#   python benchmarks/batch_recommend.py --sizes 100000 --seeds 5000
+#   python benchmarks/batch_recommend.py --npy vectors.npy      # real vectors
+#   python benchmarks/batch_recommend.py --precisions float32 int8
+
+import argparse, json, os, sys, time
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from api.recommend import VectorSnapshot, SERVING_PRECISIONS
+from ann_indexes import vector_sets
+
+
+K = 10
+
+
+def bench_set(name, vectors, args):
+    rng = np.random.default_rng(1)
+    seeds = rng.choice(len(vectors), min(args.seeds, len(vectors)), replace=False)
+
+    rows = []
+    for precision in args.precisions:
+        snapshot = VectorSnapshot.from_vectors(
+            vectors.copy(), [str(i) for i in range(len(vectors))], [None] * len(vectors),
+            time.time(), precision=precision
+        )
+        queries = snapshot.unit(seeds)
+
+        # a sample of single searches is enough to time the loop
+        loop = seeds[:args.loop_seeds]
+        t0 = time.perf_counter()
+        single = [snapshot.search(snapshot.vector(i), K + 1)[0] for i in loop]
+        loop_qps = len(loop) / (time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        batched, _ = snapshot.search_many(queries, K + 1)
+        batch_qps = len(seeds) / (time.perf_counter() - t0)
+
+        same = np.mean([set(a) == set(b) for a, b in zip(single, batched)])
+
+        rows.append({
+            "set": name,
+            "n": len(vectors),
+            "precision": precision,
+            "seeds": len(seeds),
+            "loop_qps": round(loop_qps, 1),
+            "batch_qps": round(batch_qps, 1),
+            "speedup": round(batch_qps / loop_qps, 1),
+            "same_results": round(float(same), 4),
+        })
+        r = rows[-1]
+        print(
+            f"{r['set']:<20}{r['precision']:<10}{r['seeds']:>7}{r['loop_qps']:>12}"
+            f"{r['batch_qps']:>12}{r['speedup']:>9}{r['same_results']:>8}"
+        )
+
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20000, 100000])
+    parser.add_argument("--dim", type=int, default=1017, help="synthetic vector size")
+    parser.add_argument("--npy", help="real vectors saved with np.save")
+    parser.add_argument("--mongo", action="store_true", help="load song_vectors from MONGO_URI")
+    parser.add_argument("--precisions", nargs="+", choices=SERVING_PRECISIONS, default=["float32", "int8"])
+    parser.add_argument("--seeds", type=int, default=2000, help="seed songs per batch")
+    parser.add_argument("--loop-seeds", type=int, default=100, help="seeds timed one by one")
+    parser.add_argument("--json", help="write results here")
+    args = parser.parse_args()
+
+    print(f"{'set':<20}{'matrix':<10}{'seeds':>7}{'loop q/s':>12}{'batch q/s':>12}{'speedup':>9}{'same':>8}")
+
+    results = []
+    for name, vectors in vector_sets(args):
+        results += bench_set(name, vectors, args)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# Compare hook-analysis decode backends: decode time and how far the
+# resulting hooks drift from the current path (librosa + soxr_hq).
+#
+#   python benchmarks/decode_backends.py                 # synthetic tracks
+#   python benchmarks/decode_backends.py a.mp4 b.mp4     # real files
+#   python benchmarks/decode_backends.py --json out.json
+
+import argparse, json, os, sys, tempfile, time
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "hookSelector"))
+
+from analyzer import load_audio, analyze_signal
+from hook_selector import select_hooks
+from synthetic import make_fixtures
+
+
+BASELINE = ("librosa", "soxr_hq")
+
+CONFIGS = [
+    BASELINE,
+    ("librosa", "soxr_mq"),
+    ("librosa", "soxr_lq"),
+    ("librosa", "polyphase"),
+    ("ffmpeg", None),
+    ("ffmpeg_soxr", None),
+]
+
+
+def label(config):
+    decoder, res_type = config
+    return f"{decoder}/{res_type}" if res_type else decoder
+
+
+def run_config(data, config, repeat):
+    decoder, res_type = config
+    opts = {"decoder": decoder, "res_type": res_type or "soxr_hq"}
+
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        y, sr = load_audio(data, **opts)
+        times.append(time.perf_counter() - t0)
+
+    signals, sr = analyze_signal(y, sr)
+    return min(times), select_hooks(signals, sr)
+
+
+def drift(hooks, baseline):
+    """(max start drift of any hook, drift of the best-scoring hook) in seconds."""
+    starts = np.array([h["start"] for h in hooks])
+    worst = max(float(np.min(np.abs(starts - b["start"]))) for b in baseline)
+
+    prime = max(hooks, key=lambda h: h["score"])["start"]
+    base_prime = max(baseline, key=lambda h: h["score"])["start"]
+
+    return worst, abs(prime - base_prime)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="*", help="audio files (default: synthetic)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="write per-file results here")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = args.files or [path for path, _ in make_fixtures(tmp)]
+
+        results = []
+        for path in files:
+            with open(path, "rb") as f:
+                data = f.read()
+
+            base_time, base_hooks = run_config(data, BASELINE, args.repeat)
+
+            for config in CONFIGS:
+                if config == BASELINE:
+                    seconds, hooks = base_time, base_hooks
+                else:
+                    seconds, hooks = run_config(data, config, args.repeat)
+
+                worst, prime = drift(hooks, base_hooks)
+                results.append({
+                    "file": os.path.basename(path),
+                    "backend": label(config),
+                    "decode_ms": round(1000 * seconds, 1),
+                    "speedup": round(base_time / seconds, 2),
+                    "max_drift_s": round(worst, 2),
+                    "prime_drift_s": round(prime, 2),
+                })
+
+    print(f"{'file':<24}{'backend':<20}{'decode ms':>10}{'speedup':>9}{'drift s':>9}{'prime s':>9}")
+    for r in results:
+        print(
+            f"{r['file']:<24}{r['backend']:<20}{r['decode_ms']:>10}"
+            f"{r['speedup']:>9}{r['max_drift_s']:>9}{r['prime_drift_s']:>9}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+# Offline benchmark for the hook pipeline: synthetic tracks in, stage
+# timings + peak memory + "was the planted chorus picked" out, both for the
+# prime hook process.py stores (earliest of the top hooks) and for the
+# best-scoring hook.
+# No SAAVN URLs or MongoDB needed.
+#
+#   python benchmarks/hook_pipeline.py --out results.json
+#   python benchmarks/hook_pipeline.py --baseline results.json   # compare
+#
+# Exit status is 1 when either hook misses the chorus or a stage regresses by
+# more than --tolerance against the baseline.
+
+import argparse, json, os, platform, resource, sys, tempfile, time, tracemalloc
+import numpy as np
+import librosa
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "hookSelector"))
+
+from analyzer import load_audio, analyze_signal, analyze_stream, DECODERS
+from hook_selector import score_frames, pick_hooks, rank_hooks
+from synthetic import make_track, encode, KINDS
+
+
+HOOK_DURATION = 12
+
+
+# ----------------------------
+# Stages
+# ----------------------------
+def stages(path, data, decoder, stream):
+    """(name, fn) pairs; each fn takes the previous stage's output."""
+    if stream:
+        return [
+            ("stream_analyze", lambda _: analyze_stream(path)),
+            ("score", lambda out: (score_frames(*out), out[1])),
+            ("pick", lambda out: pick_hooks(out[0], out[1] / 512, HOOK_DURATION)),
+        ]
+
+    return [
+        ("decode", lambda _: load_audio(data, decoder=decoder)),
+        ("features", lambda out: analyze_signal(*out)),
+        ("score", lambda out: (score_frames(*out), out[1])),
+        ("pick", lambda out: pick_hooks(out[0], out[1] / 512, HOOK_DURATION)),
+    ]
+
+
+def timed_run(steps):
+    times, out = {}, None
+    for name, fn in steps:
+        t0 = time.perf_counter()
+        out = fn(out)
+        times[name] = time.perf_counter() - t0
+    return times, out
+
+
+def traced_run(steps):
+    """Peak Python/numpy allocation per stage (separate run: tracing is slow)."""
+    peaks, out = {}, None
+    tracemalloc.start()
+    try:
+        for name, fn in steps:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            out = fn(out)
+            peaks[name] = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def chorus_found(start, chorus):
+    """Hook window at `start` overlaps the planted chorus by at least half."""
+    overlap = min(start + HOOK_DURATION, chorus[1]) - max(start, chorus[0])
+    return overlap >= min(HOOK_DURATION, chorus[1] - chorus[0]) / 2
+
+
+def bench_track(path, chorus, decoder, stream, repeat):
+    with open(path, "rb") as f:
+        data = f.read()
+
+    steps = stages(path, data, decoder, stream)
+
+    runs = [timed_run(steps) for _ in range(repeat)]
+    best = {name: min(r[0][name] for r in runs) for name, _ in steps}
+    hooks = runs[-1][1]
+    peaks = traced_run(steps)
+
+    # prime: what process.py stores (hooks come back in time order)
+    prime = hooks[0]["start"]
+    top = rank_hooks(hooks)[0]["start"]
+
+    return {
+        "stages": {
+            name: {
+                "ms": round(1000 * best[name], 2),
+                "peak_mb": round(peaks[name] / 2 ** 20, 2)
+            }
+            for name, _ in steps
+        },
+        "total_ms": round(1000 * sum(best.values()), 2),
+        "chorus": list(chorus),
+        "prime_start": prime,
+        "prime_found": bool(chorus_found(prime, chorus)),
+        "best_start": top,
+        "best_found": bool(chorus_found(top, chorus)),
+    }
+
+
+# ----------------------------
+# Baseline comparison
+# ----------------------------
+def compare(results, baseline, tolerance):
+    """Print per-stage ratios; return the list of regressions."""
+    regressions = []
+    base_tracks = baseline.get("tracks", {})
+
+    print(f"\n{'track':<28}{'stage':<16}{'ms':>10}{'base ms':>10}{'x':>7}{'MB':>8}{'base MB':>9}")
+    for name, track in results["tracks"].items():
+        base = base_tracks.get(name)
+        if base is None:
+            continue
+
+        for stage, cur in track["stages"].items():
+            ref = base["stages"].get(stage)
+            if ref is None:
+                continue
+
+            ratio = cur["ms"] / max(ref["ms"], 1e-3)
+            print(
+                f"{name:<28}{stage:<16}{cur['ms']:>10}{ref['ms']:>10}{ratio:>7.2f}"
+                f"{cur['peak_mb']:>8}{ref['peak_mb']:>9}"
+            )
+
+            # ignore sub-millisecond noise
+            if ratio > 1 + tolerance and cur["ms"] - ref["ms"] > 1:
+                regressions.append(f"{name}/{stage}: {ref['ms']} → {cur['ms']} ms")
+            if cur["peak_mb"] > ref["peak_mb"] * (1 + tolerance) + 1:
+                regressions.append(f"{name}/{stage}: {ref['peak_mb']} → {cur['peak_mb']} MB")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lengths", type=int, nargs="+", default=[120, 300, 600])
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=list(KINDS))
+    parser.add_argument("--decoder", choices=DECODERS, default="librosa")
+    parser.add_argument("--stream", action="store_true", help="benchmark streaming mode")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "librosa": librosa.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "decoder": args.decoder,
+            "stream": args.stream,
+        },
+        "tracks": {},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind in args.kinds:
+            for i, seconds in enumerate(args.lengths):
+                name = f"{kind}_{seconds}s"
+                y, chorus = make_track(seconds, seed=i, kind=kind)
+                path = encode(y, 44100, os.path.join(tmp, f"{name}.mp4"))
+
+                track = bench_track(path, chorus, args.decoder, args.stream, args.repeat)
+                results["tracks"][name] = track
+
+                mark = "✅" if track["prime_found"] and track["best_found"] else "❌"
+                print(
+                    f"{mark} {name:<20} total {track['total_ms']:>9.1f} ms  "
+                    + "  ".join(f"{s} {v['ms']:.1f}ms/{v['peak_mb']:.0f}MB" for s, v in track["stages"].items())
+                    + f"  prime {track['prime_start']}s {'✅' if track['prime_found'] else '❌'}"
+                    + f"  best {track['best_start']}s {'✅' if track['best_found'] else '❌'}"
+                    + f"  (chorus {chorus[0]}-{chorus[1]}s)"
+                )
+
+    results["meta"]["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    print(f"\npeak RSS: {results['meta']['max_rss_mb']} MB")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+    failed = [
+        (name, which)
+        for name, t in results["tracks"].items()
+        for which in ("prime", "best")
+        if not t[f"{which}_found"]
+    ]
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+
+    for name, which in failed:
+        print(f"❌ chorus not found as {which} hook: {name}")
+    for r in regressions:
+        print(f"❌ regression: {r}")
+
+    sys.exit(1 if failed or regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
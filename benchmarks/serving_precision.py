@@ -0,0 +1,122 @@
+# Per-request similarity latency of the API's serving matrix at each
+# precision (api/recommend.py SERVING_PRECISIONS), against the old
+# divide-by-norms path, with top-k agreement against exact float32.
+#
+#   python benchmarks/serving_precision.py                    # synthetic
+#   python benchmarks/serving_precision.py --sizes 50000 200000
+#   python benchmarks/serving_precision.py --npy vectors.npy  # real vectors
+#   python benchmarks/serving_precision.py --mongo            # song_vectors (MONGO_URI)
+
+import argparse, json, os, sys, time
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from api.recommend import VectorSnapshot, SERVING_PRECISIONS
+from ann_indexes import vector_sets
+
+
+K = 10
+
+
+def old_similarities(vectors, norms, q):
+    # the previous cosine_similarity_fast
+    q_norm = np.linalg.norm(q)
+    safe_norms = np.maximum(norms, 1e-10)
+    return np.dot(vectors, q) / (safe_norms * q_norm)
+
+
+def top_k(sims):
+    idx = np.argpartition(sims, -K)[-K:]
+    return idx[np.argsort(sims[idx])[::-1]]
+
+
+def timed_queries(sims_fn, queries):
+    """(per-query seconds, top-k rows per query)."""
+    times, found = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        found.append(top_k(sims_fn(q)))
+        times.append(time.perf_counter() - t0)
+    return np.array(times), found
+
+
+def agreement(found, truth, exact):
+    """
+    (top-k overlap, similarity loss): the share of the exact top k found,
+    and how much lower the exact similarities of the found rows are.
+    """
+    overlap = np.mean([len(np.intersect1d(f, t)) / K for f, t in zip(found, truth)])
+    loss = np.mean([1 - e[f].sum() / e[t].sum() for f, t, e in zip(found, truth, exact)])
+    return float(overlap), float(loss)
+
+
+def bench_set(name, vectors, args):
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)]
+
+    norms = np.linalg.norm(vectors, axis=1)
+    base_t, truth = timed_queries(lambda q: old_similarities(vectors, norms, q), queries)
+    exact = [old_similarities(vectors, norms, q) for q in queries]
+
+    rows = [row(name, vectors, "old (divide)", vectors.nbytes + norms.nbytes, base_t, (1.0, 0.0))]
+    print_row(rows[-1])
+
+    for precision in args.precisions:
+        snapshot = VectorSnapshot.from_vectors(
+            vectors.copy(), [str(i) for i in range(len(vectors))], [None] * len(vectors),
+            time.time(), precision=precision
+        )
+        t, found = timed_queries(snapshot.similarities, queries)
+        rows.append(row(name, vectors, precision, snapshot.nbytes, t, agreement(found, truth, exact)))
+        print_row(rows[-1])
+
+    return rows
+
+
+def row(name, vectors, label, nbytes, times, agree):
+    return {
+        "set": name,
+        "n": len(vectors),
+        "dim": vectors.shape[1],
+        "matrix": label,
+        "memory_mb": round(nbytes / 2 ** 20, 1),
+        "p50_ms": round(1000 * float(np.median(times)), 3),
+        "p95_ms": round(1000 * float(np.percentile(times, 95)), 3),
+        f"top{K}_agreement": round(agree[0], 4),
+        "sim_loss": round(agree[1], 6),
+    }
+
+
+def print_row(r):
+    print(
+        f"{r['set']:<20}{r['matrix']:<14}{r['memory_mb']:>11}{r['p50_ms']:>10}"
+        f"{r['p95_ms']:>10}{r[f'top{K}_agreement']:>12}{r['sim_loss']:>11}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20000, 100000])
+    parser.add_argument("--dim", type=int, default=1017, help="synthetic vector size")
+    parser.add_argument("--npy", help="real vectors saved with np.save")
+    parser.add_argument("--mongo", action="store_true", help="load song_vectors from MONGO_URI")
+    parser.add_argument("--precisions", nargs="+", choices=SERVING_PRECISIONS, default=list(SERVING_PRECISIONS))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--json", help="write results here")
+    args = parser.parse_args()
+
+    print(f"{'set':<20}{'matrix':<14}{'memory MB':>11}{'p50 ms':>10}{'p95 ms':>10}{f'top{K} agree':>12}{'sim loss':>11}")
+
+    results = []
+    for name, vectors in vector_sets(args):
+        results += bench_set(name, vectors, args)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
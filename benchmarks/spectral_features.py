@@ -0,0 +1,124 @@
+# Shared STFT (shared/spectral.py) vs the separate librosa feature calls
+# it replaced: time per track for the hook analyzer's curves and the
+# recommender's audio block, and the largest difference in the outputs.
+#
+#   python benchmarks/spectral_features.py                    # synthetic tracks
+#   python benchmarks/spectral_features.py a.mp4 b.mp4        # real files
+#   python benchmarks/spectral_features.py --json out.json
+
+import argparse, json, os, sys, tempfile, time, warnings
+import numpy as np
+import librosa
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "hookSelector"))
+
+from shared.fetcher import decode_audio
+from analyzer import analyze_signal, SR
+from shared.audio_features import signal_features
+from synthetic import make_fixtures
+
+warnings.simplefilter("ignore", FutureWarning)   # librosa.beat.tempo
+
+
+# ----------------------------
+# The per-feature librosa calls (one STFT each)
+# ----------------------------
+def librosa_hook_signals(y, sr):
+    y = librosa.util.normalize(y)
+    energy = librosa.feature.rms(y=y)[0]
+    beats = librosa.onset.onset_strength(y=y, sr=sr)
+    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
+    structure = np.mean(np.abs(np.diff(mfcc, axis=1)), axis=0)
+
+    n = min(len(energy), len(beats), len(structure))
+    return {"energy": energy[:n], "beats": beats[:n], "structure": structure[:n]}
+
+
+def librosa_audio_block(y, sr):
+    mfcc = np.mean(librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13), axis=1)
+    tempo = librosa.beat.tempo(y=y, sr=sr)[0]
+    centroid = np.mean(librosa.feature.spectral_centroid(y=y, sr=sr))
+    return np.concatenate(([tempo, centroid], mfcc))
+
+
+# ----------------------------
+# Measurements
+# ----------------------------
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def rel_diff(a, b):
+    return float(np.abs(np.asarray(a) - b).max() / max(np.abs(b).max(), 1e-9))
+
+
+def bench(name, data, repeat):
+    rows = []
+
+    # hook analyzer: 22.05 kHz, energy / onsets / MFCC deltas
+    y, sr = decode_audio(data, sr=SR)
+    old_s, old = timed(lambda: librosa_hook_signals(y, sr), repeat)
+    new_s, (new, _) = timed(lambda: analyze_signal(y, sr), repeat)
+    rows.append({
+        "track": name,
+        "features": "hook signals",
+        "librosa_s": round(old_s, 3),
+        "shared_s": round(new_s, 3),
+        "speedup": round(old_s / new_s, 2),
+        "max_rel_diff": max(rel_diff(new[k], old[k]) for k in old),
+    })
+
+    # recommender: native rate, tempo / centroid / mean MFCC
+    y, sr = decode_audio(data)
+    old_s, old = timed(lambda: librosa_audio_block(y, sr), repeat)
+    new_s, new = timed(lambda: signal_features(y, sr), repeat)
+    rows.append({
+        "track": name,
+        "features": "audio block",
+        "librosa_s": round(old_s, 3),
+        "shared_s": round(new_s, 3),
+        "speedup": round(old_s / new_s, 2),
+        "max_rel_diff": float(np.max(np.abs(new - old) / np.maximum(np.abs(old), 1e-9))),
+    })
+
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="*", help="audio files (default: synthetic)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="write per-track results here")
+    args = parser.parse_args()
+
+    print(f"{'track':<24}{'features':<14}{'librosa s':>11}{'shared s':>10}{'speedup':>9}{'max rel diff':>14}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        files = args.files or [path for path, _ in make_fixtures(tmp)]
+
+        for path in files:
+            with open(path, "rb") as f:
+                data = f.read()
+
+            for r in bench(os.path.basename(path), data, args.repeat):
+                results.append(r)
+                print(
+                    f"{r['track']:<24}{r['features']:<14}{r['librosa_s']:>11}{r['shared_s']:>10}"
+                    f"{r['speedup']:>9}{r['max_rel_diff']:>14.2e}"
+                )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
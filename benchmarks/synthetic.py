@@ -0,0 +1,108 @@
+# Synthetic audio fixtures for the offline benchmarks: no SAAVN URLs,
+# no MongoDB. Tracks are a chord bed with a click track and one louder,
+# busier "chorus" section whose position is known.
+
+import os, subprocess
+import numpy as np
+
+
+KINDS = ("mixed", "tones", "noise", "clicks")
+
+
+def make_track(seconds=180, sr=44100, chorus=None, seed=0, stereo=True, kind="mixed"):
+    """
+    Returns (y, chorus) with y shaped (samples, channels) float32 and
+    chorus the (start, end) seconds of the planted section.
+
+    kind: mixed  chord bed + click track
+          tones  chord bed only
+          noise  filtered noise bed with sparse noise bursts
+          clicks click track only
+    The chorus is always louder and busier than the rest of the track.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown kind {kind!r}. Use one of {KINDS}")
+
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sr)
+    t = np.arange(n) / sr
+
+    if chorus is None:
+        start = round(seconds * 0.55)
+        chorus = (start, min(start + 16, seconds - 25))
+    c0, c1 = (int(x * sr) for x in chorus)
+
+    beat = int(0.5 * sr)   # 120 bpm
+    y = np.zeros(n)
+
+    # ---------- chord bed (changes every 2 s) ----------
+    roots = 110 * 2 ** (rng.integers(0, 12, int(seconds // 2) + 1) / 12)
+    freq = roots[(t // 2).astype(int)]
+    phase = 2 * np.pi * np.cumsum(freq) / sr
+
+    if kind in ("mixed", "tones"):
+        y += 0.08 * sum(np.sin(k * phase) / k for k in (1, 2, 3, 5))
+
+    # ---------- noise bed + sparse bursts ----------
+    if kind == "noise":
+        y += 0.03 * np.convolve(rng.standard_normal(n), np.ones(8) / 8, mode="same")
+        for pos in rng.integers(0, n - sr, int(seconds // 4)):
+            y[pos:pos + sr // 10] += 0.1 * rng.standard_normal(sr // 10)
+
+    # ---------- click track ----------
+    if kind in ("mixed", "clicks"):
+        click_len = int(0.03 * sr)
+        click = rng.standard_normal(click_len) * np.exp(-np.arange(click_len) / (0.005 * sr))
+        for pos in range(0, n - click_len, beat):
+            y[pos:pos + click_len] += 0.15 * click
+
+    # ---------- chorus: louder, brighter tones, noise bursts ----------
+    y[c0:c1] *= 2.5
+    y[c0:c1] += 0.08 * np.sin(8 * phase[c0:c1])
+
+    burst_len = int(0.12 * sr)
+    burst = rng.standard_normal(burst_len) * np.exp(-np.arange(burst_len) / (0.04 * sr))
+    for pos in range(c0 + beat // 2, c1 - burst_len, beat):
+        y[pos:pos + burst_len] += 0.35 * burst
+
+    y /= np.abs(y).max() / 0.9
+
+    if stereo:
+        y = np.stack([y, 0.9 * y + 0.01 * rng.standard_normal(n)], axis=1)
+    else:
+        y = y[:, None]
+
+    return y.astype(np.float32), chorus
+
+
+def encode(y, sr, path, codec="aac", bitrate="160k"):
+    """Write y to path through ffmpeg (MP4/AAC by default, like SAAVN)."""
+    raw = np.ascontiguousarray(y, dtype=np.float32)
+
+    subprocess.run(
+        [
+            "ffmpeg", "-y", "-v", "error",
+            "-f", "f32le", "-ar", str(sr), "-ac", str(raw.shape[1]), "-i", "pipe:0",
+            "-c:a", codec, "-b:a", bitrate,
+            path
+        ],
+        input=raw.tobytes(),
+        check=True
+    )
+
+    return path
+
+
+def make_fixtures(directory, lengths=(120, 240, 480), sr=44100, kinds=("mixed",)):
+    """Encode one track per (kind, length); returns [(path, chorus), ...]."""
+    os.makedirs(directory, exist_ok=True)
+    fixtures = []
+
+    for kind in kinds:
+        for i, seconds in enumerate(lengths):
+            y, chorus = make_track(seconds, sr=sr, seed=i, kind=kind)
+            name = f"synthetic_{seconds}s.mp4" if kind == "mixed" else f"synthetic_{kind}_{seconds}s.mp4"
+            path = encode(y, sr, os.path.join(directory, name))
+            fixtures.append((path, chorus))
+
+    return fixtures
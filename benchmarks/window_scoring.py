@@ -0,0 +1,196 @@
+# Equivalence + timing check for the vectorized hook scoring in
+# hookSelector/hook_selector.py against the original per-frame loops,
+# plus the peak-picking stage against the original argsort scan.
+#
+#   python benchmarks/window_scoring.py [--seconds 300] [--runs 5]
+
+import argparse, os, sys, time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "hookSelector"))
+
+from hook_selector import normalize, pick_hooks, score_frames, sliding_window_scores
+
+
+# ----------------------------
+# Reference (pre-vectorization) implementation
+# ----------------------------
+def legacy_sliding_window_scores(signal, window_size):
+    scores = []
+    for i in range(len(signal) - window_size):
+        scores.append(np.mean(signal[i:i + window_size]))
+    return np.array(scores)
+
+
+def legacy_final_score(signals, sr, hook_duration=12):
+    energy = normalize(signals["energy"])
+    beats = normalize(signals.get("beats"))
+    structure = normalize(signals.get("structure"))
+
+    frames_per_sec = sr / 512
+    window_size = int(hook_duration * frames_per_sec)
+
+    energy_score = legacy_sliding_window_scores(energy, window_size)
+
+    contrast_score = np.zeros_like(energy_score)
+    lookback = int(5 * frames_per_sec)
+
+    for i in range(len(energy_score)):
+        prev = energy[max(0, i - lookback):i]
+        if len(prev) > 0:
+            contrast_score[i] = energy_score[i] - np.mean(prev)
+
+    contrast_score = normalize(contrast_score)
+
+    final_score = (
+        0.5 * normalize(energy_score) +
+        0.3 * contrast_score
+    )
+
+    if beats is not None:
+        final_score += 0.2 * normalize(legacy_sliding_window_scores(beats, window_size))
+
+    if structure is not None:
+        final_score += 0.1 * normalize(legacy_sliding_window_scores(structure, window_size))
+
+    song_len_sec = len(energy) / frames_per_sec
+
+    for i in range(len(final_score)):
+        t = i / frames_per_sec
+        if t < 20 or t > song_len_sec - 20:
+            final_score[i] *= 0.3
+
+    return final_score
+
+
+def legacy_pick(final_score, sr, hook_duration=12, top_n=5, min_gap=10):
+    frames_per_sec = sr / 512
+    indices = np.argsort(final_score)[::-1]
+    hooks = []
+
+    for idx in indices:
+        start = idx / frames_per_sec
+
+        if any(abs(start - h["start"]) < min_gap for h in hooks):
+            continue
+
+        hooks.append({
+            "start": round(start, 2),
+            "end": round(start + hook_duration, 2),
+            "score": round(float(final_score[idx]), 3)
+        })
+
+        if len(hooks) >= top_n:
+            break
+
+    return sorted(hooks, key=lambda x: x["start"])
+
+
+def prime_start(hooks):
+    return max(hooks, key=lambda h: h["score"])["start"]
+
+
+def check_hooks(hooks, expected, min_gap, label, same_prime=True):
+    assert len(hooks) == len(expected), \
+        f"{label}: {len(hooks)} hooks, the old scan found {len(expected)}"
+
+    assert max(h["score"] for h in hooks) == max(h["score"] for h in expected), \
+        f"{label}: best hook score changed"
+
+    # ties (flat tracks) can put an equally good prime hook elsewhere
+    if same_prime:
+        assert prime_start(hooks) == prime_start(expected), f"{label}: prime hook moved"
+
+    starts = [h["start"] for h in hooks]
+    assert all(b - a >= min_gap - 0.01 for a, b in zip(starts, starts[1:])), \
+        f"{label}: hooks closer than {min_gap}s: {starts}"
+
+
+# ----------------------------
+# Synthetic signals
+# ----------------------------
+def make_signals(n_frames, rng):
+    t = np.arange(n_frames)
+    energy = 0.3 + 0.1 * np.sin(t / 200) + 0.05 * rng.random(n_frames)
+    chorus = slice(n_frames // 2, n_frames // 2 + 600)
+    energy[chorus] += 0.4
+
+    return {
+        "energy": energy.astype("float32"),
+        "beats": rng.gamma(2.0, 1.0, n_frames).astype("float32"),
+        "structure": rng.random(n_frames).astype("float32"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=300)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--sr", type=int, default=22050)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    n_frames = int(args.seconds * args.sr / 512)
+    window = int(12 * args.sr / 512)
+
+    # ---------- window means ----------
+    for n in (0, 1, window - 1, window, window + 1, n_frames):
+        x = rng.random(n).astype("float32")
+        assert np.allclose(
+            sliding_window_scores(x, window),
+            legacy_sliding_window_scores(x, window),
+            atol=1e-6
+        ), f"window means differ (n={n})"
+
+    # ---------- full scoring ----------
+    timings = {"legacy score": 0.0, "score": 0.0, "legacy pick": 0.0, "pick": 0.0}
+    fps = args.sr / 512
+    min_gap = 10
+
+    for run in range(args.runs):
+        signals = make_signals(n_frames, rng)
+
+        t0 = time.perf_counter()
+        expected = legacy_final_score(signals, args.sr)
+        timings["legacy score"] += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        final_score = score_frames(signals, args.sr)
+        timings["score"] += time.perf_counter() - t0
+
+        assert np.allclose(final_score, expected, atol=1e-6), \
+            f"run {run}: frame scores differ"
+
+        t0 = time.perf_counter()
+        expected_hooks = legacy_pick(final_score, args.sr, min_gap=min_gap)
+        timings["legacy pick"] += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        hooks = pick_hooks(final_score, fps, min_gap=min_gap)
+        timings["pick"] += time.perf_counter() - t0
+
+        # NMS only keeps local maxima, so lower-ranked picks may differ from
+        # the old scan; the prime hook, hook count and spacing may not.
+        check_hooks(hooks, expected_hooks, min_gap, f"run {run}")
+
+    # ---------- flat / low-variance tracks (few or no peaks) ----------
+    flat_cases = {
+        "constant": np.full(n_frames, 0.5),
+        "ramp": np.linspace(0, 1, n_frames),
+        "single bump": np.exp(-((np.arange(n_frames) - n_frames / 2) / (fps * 30)) ** 2),
+        "low variance": 0.5 + 1e-4 * rng.random(n_frames),
+    }
+    for name, score in flat_cases.items():
+        for prominence in (0.0, 0.05):
+            hooks = pick_hooks(score, fps, min_gap=min_gap, prominence=prominence)
+            check_hooks(hooks, legacy_pick(score, args.sr, min_gap=min_gap), min_gap,
+                        f"{name} (prominence {prominence})", same_prime=False)
+
+    print(f"frames per track : {n_frames}")
+    for name, total in timings.items():
+        print(f"{name:<17}: {1000 * total / args.runs:.2f} ms/track")
+    print("✅ frame scores identical, prime hook and hook count unchanged")
+
+
+if __name__ == "__main__":
+    main()
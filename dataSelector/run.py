@@ -1,8 +1,13 @@
 # Working well sent data to mongo db as per requirement
 import requests
 import os
+import sys
 import time
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.bulk_writer import BulkWriter
 
 BASE_URL = os.environ.get("SAAVN_API_URL")
 if BASE_URL is None:
@@ -53,32 +58,37 @@ def save_songs_to_mongodb(query):
     # 🔒 LIMIT playlists to avoid hitting rate limit
     playlists = playlists[:5]
 
-    for item in playlists:
-        playlist_id = item.get("id")
-        if not playlist_id:
-            continue
+    # upserts are batched into unordered bulk writes (one round-trip per batch)
+    with BulkWriter(songs_collection) as writer:
+        for item in playlists:
+            playlist_id = item.get("id")
+            if not playlist_id:
+                continue
 
-        print(f"🎵 Fetching playlist → {playlist_id}")
+            print(f"🎵 Fetching playlist → {playlist_id}")
 
-        response = fetch_playlist_songs(playlist_id)
-        songs = response.get("data", {}).get("songs", [])
+            response = fetch_playlist_songs(playlist_id)
+            songs = response.get("data", {}).get("songs", [])
 
-        for song in songs:
-            song_id = song.get("id")
-            if not song_id:
-                continue
+            for song in songs:
+                song_id = song.get("id")
+                if not song_id:
+                    continue
 
-            song["_id"] = song_id
-            song["playlist_id"] = playlist_id
+                song["_id"] = song_id
+                song["playlist_id"] = playlist_id
 
-            # UPSERT = insert if not exists, update if exists
-            songs_collection.update_one(
-                {"_id": song_id},
-                {"$set": song},
-                upsert=True
-            )
+                # UPSERT = insert if not exists, update if exists
+                writer.add(
+                    UpdateOne(
+                        {"_id": song_id},
+                        {"$set": song},
+                        upsert=True
+                    ),
+                    song_id
+                )
 
-    print(f"✅ Songs saved for query → {query}")
+    print(f"✅ Songs saved for query → {query} ({writer.written} written, {len(writer.failed)} failed)")
 
 # ---------------------------------------
 def get_language_queries_from_db():
@@ -1,34 +1,221 @@
+import subprocess
 import librosa
 import numpy as np
 
+from shared.fetcher import decode_audio, decode_pcm
+from shared.spectral import (
+    Spectrum, frame_spectra, power_db, mfcc_from_db, onset_flux, onset_pad,
+    N_FFT, HOP_LENGTH, N_MELS, N_MFCC
+)
+
+
+SR = 22050
+
+STREAM_BLOCK_SECONDS = 10
+
+# librosa: decode at native rate, then resample with res_type (the
+#          original path; soxr_hq is what librosa.load uses)
+# ffmpeg / ffmpeg_soxr: ffmpeg downmixes + resamples while decoding
+DECODERS = ("librosa", "ffmpeg", "ffmpeg_soxr")
+RES_TYPES = ("soxr_vhq", "soxr_hq", "soxr_mq", "soxr_lq", "polyphase", "fft")
+
+
+def load_audio(audio, sr=SR, decoder="librosa", res_type="soxr_hq"):
+    """
+    Mono float32 signal at sr.
+    audio: file path, or the encoded file's bytes (decoded in memory)
+    """
+    if decoder in ("ffmpeg", "ffmpeg_soxr"):
+        return decode_pcm(audio, sr, soxr=decoder == "ffmpeg_soxr")
+
+    if decoder != "librosa":
+        raise ValueError(f"Unknown decoder {decoder!r}. Use one of {DECODERS}")
+
+    if isinstance(audio, (bytes, bytearray)):
+        return decode_audio(audio, sr=sr, res_type=res_type)
+
+    return librosa.load(audio, sr=sr, mono=True, res_type=res_type)
+
+
+def analyze_audio(audio, stream=False, block_seconds=STREAM_BLOCK_SECONDS,
+                  decoder="librosa", res_type="soxr_hq"):
+    """
+    audio: file path, or the encoded file's bytes (decoded in memory)
+    stream: decode block by block (file paths only)
+    """
+    if stream:
+        return analyze_stream(audio, block_seconds=block_seconds)
+
+    y, sr = load_audio(audio, decoder=decoder, res_type=res_type)
+    return analyze_signal(y, sr)
+
+
+def analyze_signal(y, sr, res_type="soxr_hq"):
+    """Hook signals for an already decoded mono signal (any sample rate)."""
+    if sr != SR:
+        y = librosa.resample(y, orig_sr=sr, target_sr=SR, res_type=res_type)
+        sr = SR
 
-def analyze_audio(audio_path):
-    y, sr = librosa.load(audio_path, sr=22050, mono=True)
     y = librosa.util.normalize(y)
 
+    # one STFT / mel spectrogram for all three curves
+    spec = Spectrum(y, sr, n_fft=N_FFT, hop_length=HOP_LENGTH, n_mels=N_MELS)
+
     # ---------- ENERGY ----------
-    energy = librosa.feature.rms(y=y)[0]
+    energy = spec.rms
 
     # ---------- BEATS ----------
-    beats = librosa.onset.onset_strength(y=y, sr=sr)
+    beats = spec.onset_strength()
 
     # ---------- STRUCTURE ----------
-    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-    structure = np.mean(np.abs(np.diff(mfcc, axis=1)), axis=0)
-
-    # ---------- ALIGN LENGTHS (🔥 FIX 🔥) ----------
-    min_len = min(
-        len(energy),
-        len(beats),
-        len(structure)
-    )
+    structure = np.mean(np.abs(np.diff(spec.mfcc(N_MFCC), axis=0)), axis=1)
+
+    return align_signals(energy, beats, structure), sr
+
 
-    energy = energy[:min_len]
-    beats = beats[:min_len]
-    structure = structure[:min_len]
+def align_signals(energy, beats, structure):
+    """
+    energy and beats have one value per frame; structure is a frame to
+    frame difference, so it is one shorter and the last frame is dropped.
+    """
+    n = len(structure)
 
     return {
-        "energy": energy,
-        "beats": beats,
+        "energy": energy[:n],
+        "beats": beats[:n],
         "structure": structure
-    }, sr
+    }
+
+
+# ----------------------------
+# Streaming mode (bounded memory)
+# ----------------------------
+def pcm_blocks(audio_path, sr, block_size):
+    """
+    Decode audio_path with ffmpeg to mono float32 at sr and yield it
+    block_size samples at a time.
+    """
+    proc = subprocess.Popen(
+        [
+            "ffmpeg", "-nostdin", "-v", "error",
+            "-i", audio_path,
+            "-f", "f32le", "-ac", "1", "-ar", str(sr),
+            "pipe:1"
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+
+    try:
+        while True:
+            data = proc.stdout.read(block_size * 4)
+            if not data:
+                break
+            yield np.frombuffer(data, dtype=np.float32)
+    finally:
+        proc.stdout.close()
+        err = proc.stderr.read()
+        proc.stderr.close()
+        returncode = proc.wait()
+
+    if returncode != 0:
+        raise RuntimeError(f"ffmpeg decode failed: {err.decode(errors='replace').strip()}")
+
+
+class StreamingAnalyzer:
+    """
+    Incremental energy / onset / MFCC-delta curves.
+
+    Frames follow librosa's centered framing (n_fft // 2 zeros on both
+    ends), so the curves line up frame for frame with analyze_audio().
+    Only one block of samples plus a frame of overlap is held at a time.
+
+    The 80 dB floor that power_to_db applies is tracked against the
+    running maximum instead of the whole-track maximum, which only
+    affects frames far below the loudest part seen so far.
+    """
+
+    def __init__(self, sr, n_fft=N_FFT, hop_length=HOP_LENGTH,
+                 n_mels=N_MELS, n_mfcc=N_MFCC, top_db=80.0):
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.n_mels = n_mels
+        self.n_mfcc = n_mfcc
+        self.top_db = top_db
+
+        self.buffer = np.zeros(n_fft // 2, dtype=np.float32)
+        self.db_max = -np.inf
+        self.prev_db = None
+        self.prev_mfcc = None
+
+        self.energy = []
+        self.flux = []
+        self.structure = []
+
+    def feed(self, block):
+        self.buffer = np.concatenate((self.buffer, block))
+
+        if len(self.buffer) < self.n_fft:
+            return
+
+        frames = librosa.util.frame(
+            self.buffer,
+            frame_length=self.n_fft,
+            hop_length=self.hop_length,
+            axis=0
+        )
+        self._process(frames)
+        self.buffer = self.buffer[len(frames) * self.hop_length:]
+
+    def finish(self):
+        self.feed(np.zeros(self.n_fft // 2, dtype=np.float32))
+
+        energy = np.concatenate(self.energy) if self.energy else np.zeros(0)
+
+        pad = onset_pad(self.n_fft, self.hop_length)
+        beats = np.concatenate([np.zeros(pad)] + self.flux)[:len(energy)]
+
+        structure = np.concatenate(self.structure) if self.structure else np.zeros(0)
+
+        return align_signals(
+            energy.astype(np.float32),
+            beats.astype(np.float32),
+            structure.astype(np.float32)
+        )
+
+    def _process(self, frames):
+        # ---------- ENERGY + LOG-MEL (shared by onsets and MFCC) ----------
+        rms, _, mel = frame_spectra(frames, self.sr, self.n_mels)
+        self.energy.append(rms)
+
+        self.db_max = max(self.db_max, 10.0 * np.log10(max(1e-10, mel.max())))
+        db = power_db(mel, self.db_max, self.top_db)
+
+        mfcc = mfcc_from_db(db, self.n_mfcc)
+
+        # ---------- BEATS / STRUCTURE (diff across the block seam) ----------
+        if self.prev_db is not None:
+            db_run = np.vstack((self.prev_db, db))
+            mfcc_run = np.vstack((self.prev_mfcc, mfcc))
+        else:
+            db_run, mfcc_run = db, mfcc
+
+        self.flux.append(onset_flux(db_run))
+        self.structure.append(np.mean(np.abs(np.diff(mfcc_run, axis=0)), axis=1))
+
+        self.prev_db = db[-1:]
+        self.prev_mfcc = mfcc[-1:]
+
+
+def analyze_stream(audio_path, sr=SR, block_seconds=STREAM_BLOCK_SECONDS):
+    """
+    Same signal dict as analyze_audio(), computed block by block so
+    memory is bounded by block_seconds instead of the track length.
+    """
+    analyzer = StreamingAnalyzer(sr)
+
+    for block in pcm_blocks(audio_path, sr, int(block_seconds * sr)):
+        analyzer.feed(block)
+
+    return analyzer.finish(), sr
@@ -1,5 +1,6 @@
 import numpy as np
 import librosa
+from scipy.signal import find_peaks
 
 
 def normalize(x):
@@ -9,21 +10,43 @@ def normalize(x):
     return (x - x.min()) / (x.max() - x.min() + 1e-6)
 
 
+def prefix_sums(x):
+    """Cumulative sum with a leading zero: sum(x[a:b]) == c[b] - c[a]."""
+    c = np.zeros(len(x) + 1, dtype=np.float64)
+    np.cumsum(x, dtype=np.float64, out=c[1:])
+    return c
+
+
 def sliding_window_scores(signal, window_size):
-    scores = []
-    for i in range(len(signal) - window_size):
-        scores.append(np.mean(signal[i:i + window_size]))
-    return np.array(scores)
+    """Mean of every window starting at 0 .. len(signal) - window_size - 1."""
+    n = len(signal) - window_size
+    if n <= 0:
+        return np.array([])
 
+    c = prefix_sums(signal)
+    return (c[window_size:window_size + n] - c[:n]) / window_size
 
-def select_hooks(
-    signals,
-    sr,
-    hook_duration=12,
-    top_n=5,
-    min_gap=10
-):
+
+def lookback_means(signal, n, lookback):
+    """
+    Mean of signal[max(0, i - lookback):i] for i in range(n).
+    Returns (means, has_prev); means is 0 where the slice is empty.
     """
+    c = prefix_sums(signal)
+    i = np.arange(n)
+    lo = np.maximum(0, i - lookback)
+    count = i - lo
+
+    has_prev = count > 0
+    means = np.zeros(n, dtype=np.float64)
+    means[has_prev] = (c[i[has_prev]] - c[lo[has_prev]]) / count[has_prev]
+    return means, has_prev
+
+
+def score_frames(signals, sr, hook_duration=12):
+    """
+    Hook score for every candidate start frame.
+
     signals: dict from analyzer
     sr: sample rate
     """
@@ -42,10 +65,8 @@ def select_hooks(
     contrast_score = np.zeros_like(energy_score)
     lookback = int(5 * frames_per_sec)
 
-    for i in range(len(energy_score)):
-        prev = energy[max(0, i - lookback):i]
-        if len(prev) > 0:
-            contrast_score[i] = energy_score[i] - np.mean(prev)
+    prev_mean, has_prev = lookback_means(energy, len(energy_score), lookback)
+    contrast_score[has_prev] = energy_score[has_prev] - prev_mean[has_prev]
 
     contrast_score = normalize(contrast_score)
 
@@ -66,28 +87,104 @@ def select_hooks(
     # ---------- PENALIZE INTRO / OUTRO ----------
     song_len_sec = len(energy) / frames_per_sec
 
-    for i in range(len(final_score)):
-        t = i / frames_per_sec
-        if t < 20 or t > song_len_sec - 20:
-            final_score[i] *= 0.3
+    t = np.arange(len(final_score)) / frames_per_sec
+    final_score[(t < 20) | (t > song_len_sec - 20)] *= 0.3
 
-    # ---------- PICK TOP NON-OVERLAPPING HOOKS ----------
-    indices = np.argsort(final_score)[::-1]
+    return final_score
+
+
+def peak_frames(score, prominence=0.0):
+    """
+    Local maxima of score (a plateau counts once). The first and last
+    frames can be peaks too.
+    """
+    if len(score) == 0:
+        return np.array([], dtype=int)
+
+    floor = score.min() - 1
+    padded = np.concatenate(([floor], score, [floor]))
+    peaks, _ = find_peaks(padded, prominence=prominence if prominence > 0 else None)
+    return peaks - 1
+
+
+def pick_hooks(
+    final_score,
+    frames_per_sec,
+    hook_duration=12,
+    top_n=5,
+    min_gap=10,
+    prominence=0.0
+):
+    """
+    Greedy non-maximum suppression over the score peaks: take the best
+    remaining peak, then mask every frame closer than min_gap seconds.
+    Flat or low-variance tracks can have fewer than top_n usable peaks;
+    the rest are then filled from the best remaining frames (the old
+    argsort scan), so the hook count doesn't depend on the peak shape.
+    """
+    peaks = peak_frames(final_score, prominence)
+    by_peak = peaks[np.argsort(final_score[peaks], kind="stable")[::-1]]
+
+    radius = int(np.ceil(min_gap * frames_per_sec)) - 1
+    free = np.ones(len(final_score), dtype=bool)
     hooks = []
 
-    for idx in indices:
-        start = idx / frames_per_sec
+    def take(order):
+        for idx in order:
+            if len(hooks) >= top_n:
+                return
 
-        if any(abs(start - h["start"]) < min_gap for h in hooks):
-            continue
+            if not free[idx]:
+                continue
 
-        hooks.append({
-            "start": round(start, 2),
-            "end": round(start + hook_duration, 2),
-            "score": round(float(final_score[idx]), 3)
-        })
+            free[max(0, idx - radius):idx + radius + 1] = False
+            start = idx / frames_per_sec
 
-        if len(hooks) >= top_n:
-            break
+            hooks.append({
+                "start": round(start, 2),
+                "end": round(start + hook_duration, 2),
+                "score": round(float(final_score[idx]), 3)
+            })
+
+    take(by_peak)
+
+    if len(hooks) < top_n:
+        # only sort the frames no hook has masked yet
+        rest = np.flatnonzero(free)
+        take(rest[np.argsort(final_score[rest], kind="stable")[::-1]])
 
     return sorted(hooks, key=lambda x: x["start"])
+
+
+def select_hooks(
+    signals,
+    sr,
+    hook_duration=12,
+    top_n=5,
+    min_gap=10,
+    prominence=0.0
+):
+    """
+    signals: dict from analyzer
+    sr: sample rate
+    min_gap: suppression window in seconds between two hook starts
+    prominence: minimum peak prominence (in score units) for a candidate
+    """
+
+    frames_per_sec = sr / 512
+    final_score = score_frames(signals, sr, hook_duration)
+
+    # ---------- PICK TOP NON-OVERLAPPING HOOKS ----------
+    return pick_hooks(
+        final_score,
+        frames_per_sec,
+        hook_duration=hook_duration,
+        top_n=top_n,
+        min_gap=min_gap,
+        prominence=prominence
+    )
+
+
+def rank_hooks(hooks):
+    """Hooks best-first (select_hooks returns them in time order)."""
+    return sorted(hooks, key=lambda x: x["score"], reverse=True)
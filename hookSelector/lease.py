@@ -0,0 +1,116 @@
+# Lease-based work claiming so several hook workers (on one or many
+# machines) can drain the same song queue without doing songs twice.
+#
+# A claimed song carries {"lease": {"owner": <worker>, "expires": <utc>}}.
+# The owner renews its leases from a heartbeat thread and clears them
+# when a song is done; leases of a crashed worker simply expire and are
+# claimed again by whoever asks next.
+
+import os, socket, threading, uuid
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument, UpdateOne
+
+
+class WorkLease:
+
+    def __init__(self, collection, query, batch_size=20, ttl=600, owner=None):
+        self.collection = collection
+        self.query = query
+        self.batch_size = batch_size
+        self.ttl = timedelta(seconds=ttl)
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self.held = set()
+        self.given_back = set()   # failed here; don't claim them again this run
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.heartbeat = None
+
+        collection.create_index("lease.expires")
+
+    # ---------- claiming ----------
+    def claimable(self, now):
+        with self.lock:
+            given_back = list(self.given_back)
+
+        return {
+            "$and": [
+                self.query,
+                {"_id": {"$nin": given_back}},
+                {"$or": [
+                    {"lease": {"$exists": False}},
+                    {"lease.expires": {"$lt": now}}
+                ]}
+            ]
+        }
+
+    def claim_batch(self):
+        now = datetime.utcnow()
+        batch = []
+
+        for _ in range(self.batch_size):
+            song = self.collection.find_one_and_update(
+                self.claimable(now),
+                {"$set": {"lease": {"owner": self.owner, "expires": now + self.ttl}}},
+                return_document=ReturnDocument.AFTER
+            )
+            if song is None:
+                break
+            batch.append(song)
+
+        with self.lock:
+            self.held.update(song["_id"] for song in batch)
+
+        return batch
+
+    def __iter__(self):
+        while not self.stopped.is_set():
+            batch = self.claim_batch()
+            if not batch:
+                return
+            yield from batch
+
+    # ---------- renewing ----------
+    def renew(self):
+        with self.lock:
+            held = list(self.held)
+
+        if not held:
+            return
+
+        self.collection.update_many(
+            {"_id": {"$in": held}, "lease.owner": self.owner},
+            {"$set": {"lease.expires": datetime.utcnow() + self.ttl}}
+        )
+
+    def start(self):
+        def beat():
+            while not self.stopped.wait(self.ttl.total_seconds() / 3):
+                try:
+                    self.renew()
+                except Exception as e:
+                    print(f"⚠️ Lease renewal failed: {repr(e)}")
+
+        self.heartbeat = threading.Thread(target=beat, daemon=True)
+        self.heartbeat.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.heartbeat is not None:
+            self.heartbeat.join()
+
+    # ---------- releasing ----------
+    def done(self, song_id):
+        with self.lock:
+            self.held.discard(song_id)
+
+    def release_op(self, song_id):
+        """Write op that drops our lease without touching anything else."""
+        self.done(song_id)
+        with self.lock:
+            self.given_back.add(song_id)
+        return UpdateOne(
+            {"_id": song_id, "lease.owner": self.owner},
+            {"$unset": {"lease": ""}}
+        )
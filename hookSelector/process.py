@@ -1,10 +1,20 @@
 # process the songs after run.py which generate the hooks
 
-import requests, tempfile, os, traceback
-from pymongo import MongoClient
+import os, sys, traceback, argparse, queue, threading
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from pymongo import MongoClient, UpdateOne
 
-from analyzer import analyze_audio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.fetcher import fetch_bytes, fetch_to_file, decode_audio
+from shared.feature_cache import FeatureCache
+from shared.audio_features import audio_windows, audio_fingerprint, cache_features, AUDIO_WINDOW
+from shared.bulk_writer import BulkWriter
+from analyzer import analyze_audio, analyze_signal, DECODERS, RES_TYPES
 from hook_selector import select_hooks
+from lease import WorkLease
 
 
 # ----------------------------
@@ -12,6 +22,19 @@ from hook_selector import select_hooks
 # ----------------------------
 MODE = "hook_continue"
 # MODE = "rehook"
+
+# Tracks longer than this (seconds) are analyzed in streaming mode so
+# long DJ mixes / live sets don't have to fit in memory.
+STREAM_ABOVE_SECONDS = 15 * 60
+
+# Streamed tracks are spooled to a temp file, everything else stays in
+# memory. Hard caps on the download size for each case.
+MAX_MEMORY_BYTES = 64 << 20
+MAX_STREAM_BYTES = 1 << 30
+
+# Leave the recommender's audio block in the feature cache for songs it
+# will recompute (librosa decoder, in-memory tracks only).
+AUDIO_HANDOFF = True
 # ----------------------------
 
 
@@ -21,21 +44,37 @@ MODE = "hook_continue"
 client = MongoClient(os.environ["MONGO_URI"])
 db = client.musicdb
 songs = db.songs
+vectors = db.song_vectors
+
+# hook updates are buffered and sent as unordered bulk writes
+hook_writer = BulkWriter(songs, batch_size=200, flush_interval=10.0)
+
+# set by run() in --claim mode
+lease = None
 
 
 # ----------------------------
-# Download MP4
+# Fetch Audio
 # ----------------------------
-def download_mp4(url):
-    r = requests.get(url, stream=True, timeout=40)
-    r.raise_for_status()
+def audio_url(song):
+    return song["downloadUrl"][2]["url"]
 
-    temp = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
-    for chunk in r.iter_content(8192):
-        temp.write(chunk)
-    temp.close()
 
-    return temp.name
+def fetch_audio(song):
+    """
+    Encoded audio for a song: bytes in memory, or a temp file path for
+    tracks that will be analyzed in streaming mode.
+    """
+    url = audio_url(song)
+
+    if use_stream(song):
+        return fetch_to_file(url, suffix=".mp4", max_bytes=MAX_STREAM_BYTES)
+
+    return fetch_bytes(url, max_bytes=MAX_MEMORY_BYTES)
+
+
+def use_stream(song):
+    return float(song.get("duration") or 0) > STREAM_ABOVE_SECONDS
 
 
 # ----------------------------
@@ -47,45 +86,289 @@ def to_timestamp(sec):
     return f"{m:02d}:{s:02d}"
 
 
+# ----------------------------
+# Audio hand-off to the recommender
+# ----------------------------
+def stored_vector(song):
+    """
+    The song's song_vectors entry (just its fingerprint), None when the
+    recommender hasn't vectorized it yet.
+    """
+    return vectors.find_one({"song_id": song["id"]}, {"_id": 0, "fingerprint.audio": 1})
+
+
+def needs_audio(vector, fingerprint):
+    # same rule as feature_extractor's incremental mode: new songs and
+    # changed audio are recomputed, vectors from before fingerprints are kept
+    if vector is None:
+        return True
+
+    stored = (vector.get("fingerprint") or {}).get("audio")
+    return stored is not None and stored != fingerprint
+
+
+def hand_off_audio(song, y, sr, hook_data, vector):
+    """
+    Cache the recommender's audio block when its next run will ask for it.
+    Windows come from the stored (whole second) hook, as the recommender
+    derives them.
+    """
+    windows = None
+    if AUDIO_WINDOW == "hook":
+        hook_start = None
+        if hook_data["primehook"]:
+            m, s = hook_data["primehook"].split(":")
+            hook_start = float(int(m) * 60 + int(s))
+
+        try:
+            duration = float(song.get("duration"))
+        except (TypeError, ValueError):
+            duration = None
+
+        windows = audio_windows(hook_start, duration)
+
+    url = audio_url(song)
+    if needs_audio(vector, audio_fingerprint(url, windows)):
+        cache_features(song["id"], url, y, sr, windows)
+
+
+# ----------------------------
+# Analyze One File (runs in worker processes)
+# ----------------------------
+def hooks_from_audio(song, audio, stream=False, decoder="librosa", res_type="soxr_hq",
+                     handoff=False, vector=None):
+    y = None
+
+    if stream:
+        signals, sr = analyze_audio(audio, stream=True)
+
+    elif decoder == "librosa":
+        # native rate first, so the same signal also serves the hand-off
+        y, native_sr = decode_audio(audio, sr=None)
+        signals, sr = analyze_signal(y, native_sr, res_type=res_type)
+
+    else:
+        # ffmpeg decodes straight to 22050 Hz mono (no hand-off)
+        signals, sr = analyze_audio(audio, decoder=decoder)
+
+    # stored in time order: prime = earliest of the top hooks. The
+    # recommender's hook_ratio is built on that, so switching to
+    # best-first (hook_selector.rank_hooks) needs a full rehook.
+    hooks = select_hooks(signals, sr)
+
+    hook_data = {
+        "primehook": to_timestamp(hooks[0]["start"]) if len(hooks) > 0 else None,
+        "sechook": to_timestamp(hooks[1]["start"]) if len(hooks) > 1 else None,
+        "subhook": to_timestamp(hooks[2]["start"]) if len(hooks) > 2 else None
+    }
+
+    if handoff and y is not None:
+        try:
+            hand_off_audio(song, y, native_sr, hook_data, vector)
+        except Exception as e:
+            # the recommender just decodes the song itself
+            print(f"⚠️ Audio hand-off failed ({song['_id']}): {repr(e)}")
+
+    return hook_data
+
+
+def store_hook(song, hook_data):
+    update = {"$set": {"hook": hook_data, "hooked_at": datetime.utcnow()}}
+
+    if lease is not None:
+        update["$unset"] = {"lease": ""}
+        lease.done(song["_id"])
+
+    hook_writer.add(UpdateOne({"_id": song["_id"]}, update), song["_id"])
+
+    print(f"✅ Hook queued → {song['_id']}")
+
+
+def report_error(song, e):
+    print(f"❌ Error ({song['_id']}): {repr(e)}")
+    traceback.print_exception(e)
+
+    # give the song back right away instead of waiting for the lease to expire
+    if lease is not None:
+        hook_writer.add(lease.release_op(song["_id"]), song["_id"])
+
+
+def remove_file(audio):
+    if isinstance(audio, str) and os.path.exists(audio):
+        os.remove(audio)
+
+
 # ----------------------------
 # Process One Song
 # ----------------------------
-def process_song(song):
-    audio_path = None
+def process_song(song, decode_opts=None):
+    audio = None
 
     try:
-        mp4_url = song["downloadUrl"][2]["url"]
-        audio_path = download_mp4(mp4_url)
+        audio = fetch_audio(song)
 
-        signals, sr = analyze_audio(audio_path)
-        hooks = select_hooks(signals, sr)
+        store_hook(song, hooks_from_audio(song, audio, use_stream(song), **song_opts(song, decode_opts)))
 
-        hook_data = {
-            "primehook": to_timestamp(hooks[0]["start"]) if len(hooks) > 0 else None,
-            "sechook": to_timestamp(hooks[1]["start"]) if len(hooks) > 1 else None,
-            "subhook": to_timestamp(hooks[2]["start"]) if len(hooks) > 2 else None
-        }
+    except Exception as e:
+        report_error(song, e)
 
-        songs.update_one(
-            {"_id": song["_id"]},
-            {"$set": {"hook": hook_data}}
-        )
+    finally:
+        remove_file(audio)
 
-        print(f"✅ Hook stored → {song['_id']}")
 
-    except Exception as e:
-        print(f"❌ Error ({song['_id']}): {repr(e)}")
-        traceback.print_exc()
+def song_opts(song, decode_opts):
+    """decode_opts plus the stored vector the hand-off decision needs."""
+    opts = dict(decode_opts or {})
+
+    if opts.get("handoff") and not use_stream(song):
+        opts["vector"] = stored_vector(song)
+    else:
+        opts["handoff"] = False
+
+    return opts
+
+
+# ----------------------------
+# Pipelined Runner
+# ----------------------------
+# cursor → [download threads] → [analysis processes] → [writer thread]
+#
+# Every hand-off is bounded, so a slow stage stalls the ones before it
+# instead of piling up songs (or downloaded audio) in memory.
+def run_pipeline(cursor, workers, io_threads, decode_opts=None):
+    download_q = queue.Queue(maxsize=io_threads * 2)
+    write_q = queue.Queue()
+    in_flight = threading.BoundedSemaphore(workers * 2)
+
+    # spawn: the parent already runs threads, forking them is unsafe
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+    def downloader():
+        while True:
+            song = download_q.get()
+            if song is None:
+                return
+
+            audio = None
+            try:
+                audio = fetch_audio(song)
+                opts = song_opts(song, decode_opts)
+
+                in_flight.acquire()
+                try:
+                    future = pool.submit(
+                        hooks_from_audio, song, audio, use_stream(song), **opts
+                    )
+                except Exception:
+                    in_flight.release()
+                    raise
+
+            except Exception as e:
+                write_q.put((song, audio, None, e))
+                continue
+
+            # don't pin in-memory audio in the callback, only temp files
+            if not isinstance(audio, str):
+                audio = None
+
+            future.add_done_callback(
+                lambda f, song=song, audio=audio:
+                    write_q.put((song, audio, f, None))
+            )
+
+    def write(song, audio, future, error):
+        try:
+            if future is not None:
+                in_flight.release()
+                store_hook(song, future.result())
+            else:
+                report_error(song, error)
+
+        except Exception as e:
+            report_error(song, e)
+
+        finally:
+            remove_file(audio)
+
+    def writer():
+        # nothing here may end the thread: in_flight would never be
+        # released again and run() would hang on the downloaders
+        while True:
+            try:
+                item = write_q.get(timeout=hook_writer.flush_interval)
+            except queue.Empty:
+                item = ()
+
+            if item is None:
+                return
+
+            try:
+                if item:
+                    write(*item)
+                else:
+                    hook_writer.flush()
+
+            except Exception as e:
+                # e.g. a bson InvalidDocument from bulk_write: that batch is lost
+                print(f"❌ Hook write failed: {repr(e)}")
+                traceback.print_exception(e)
+
+    downloaders = [
+        threading.Thread(target=downloader, daemon=True)
+        for _ in range(io_threads)
+    ]
+    writer_thread = threading.Thread(target=writer, daemon=True)
+
+    for t in downloaders:
+        t.start()
+    writer_thread.start()
+
+    count = 0
+    try:
+        for song in cursor:
+            count += 1
+            download_q.put(song)
 
     finally:
-        if audio_path and os.path.exists(audio_path):
-            os.remove(audio_path)
+        for _ in downloaders:
+            download_q.put(None)
+        for t in downloaders:
+            t.join()
+
+        pool.shutdown(wait=True)
+
+        write_q.put(None)
+        writer_thread.join()
+
+    return count
+
+
+def handoff_fits(query):
+    """
+    Hand-off entries are only removed when the recommender reads them, so
+    skip it for runs whose songs wouldn't all fit in the cache budget.
+    """
+    cache = FeatureCache()
+    pending = songs.count_documents(query)
+
+    if pending > cache.capacity():
+        print(f"⚠️ Audio hand-off off: {pending} songs > ~{cache.capacity()} cache entries (WAVEHOOK_CACHE_MB)")
+        return False
+
+    vectors.create_index("song_id")
+    return True
 
 
 # ----------------------------
 # Batch Runner (WITH MODE)
 # ----------------------------
-def run():
+def run(workers=1, io_threads=4, claim=False, lease_ttl=600, rehook_before=None,
+        decoder="librosa", res_type="soxr_hq"):
+    global lease
+
     if MODE == "hook_continue":
         print("▶ MODE: HOOK CONTINUE (skip already hooked)")
         query = {
@@ -102,15 +385,86 @@ def run():
     else:
         raise ValueError("Invalid MODE. Use 'hook_continue' or 'rehook'")
 
-    cursor = songs.find(query)
+    if claim:
+        if MODE == "rehook":
+            # songs hooked since the campaign started are done
+            rehook_before = rehook_before or datetime.utcnow()
+            query["$or"] = [
+                {"hooked_at": {"$exists": False}},
+                {"hooked_at": {"$lt": rehook_before}}
+            ]
 
-    count = 0
-    for song in cursor:
-        count += 1
-        process_song(song)
+        lease = WorkLease(songs, query, batch_size=max(workers, 1) * 4, ttl=lease_ttl).start()
+        print(f"🔒 Claiming work as {lease.owner} (lease {lease_ttl}s)")
+        cursor = lease
+
+    else:
+        cursor = songs.find(query)
+
+    decode_opts = {
+        "decoder": decoder,
+        "res_type": res_type,
+        "handoff": AUDIO_HANDOFF and decoder == "librosa" and handoff_fits(query)
+    }
+
+    if workers > 1:
+        print(f"⚙️ Pipeline: {workers} analysis workers, {io_threads} download threads")
+        count = run_pipeline(cursor, workers, io_threads, decode_opts)
+
+    else:
+        count = 0
+        for song in cursor:
+            count += 1
+            process_song(song, decode_opts)
+
+    hook_writer.flush()
+
+    if lease is not None:
+        lease.stop()
 
     print(f"🏁 Finished. Total processed: {count}")
+    print(f"💾 Hooks written: {hook_writer.written}, failed writes: {len(hook_writer.failed)}")
 
 
 if __name__ == "__main__":
-    run()
+    parser = argparse.ArgumentParser(description="Detect and store hooks for songs")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1,
+        help="analysis processes (1 = old serial loop)"
+    )
+    parser.add_argument(
+        "--io-threads", type=int, default=4,
+        help="concurrent downloads"
+    )
+    parser.add_argument(
+        "--claim", action="store_true",
+        help="lease batches of songs so several workers can run at once"
+    )
+    parser.add_argument(
+        "--lease-ttl", type=int, default=600,
+        help="seconds before an unrenewed lease can be reclaimed"
+    )
+    parser.add_argument(
+        "--rehook-before", type=datetime.fromisoformat, default=None,
+        help="rehook + claim: redo songs hooked before this UTC time "
+             "(share it across workers of one campaign; default: now)"
+    )
+    parser.add_argument(
+        "--decoder", choices=DECODERS, default="librosa",
+        help="decode backend (see benchmarks/decode_backends.py)"
+    )
+    parser.add_argument(
+        "--res-type", choices=RES_TYPES, default="soxr_hq",
+        help="resampler for the librosa decoder"
+    )
+    args = parser.parse_args()
+
+    run(
+        workers=args.workers,
+        io_threads=args.io_threads,
+        claim=args.claim,
+        lease_ttl=args.lease_ttl,
+        rehook_before=args.rehook_before,
+        decoder=args.decoder,
+        res_type=args.res_type
+    )
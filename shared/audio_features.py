@@ -0,0 +1,118 @@
+# Audio block of the recommender's song vectors: tempo, spectral
+# centroid and mean MFCCs, from the whole track or from bounded windows
+# of it (the prime hook ± HOOK_WINDOW s, or a few excerpts when a song
+# has no hook yet). Window mode keeps feature time constant and only
+# decodes up to the last window; see benchmarks/audio_windows.py for the
+# timings and how far it drifts from full tracks.
+#
+# The hook stage already holds each song's decoded signal, so it
+# computes the block there and leaves it in the feature cache for the
+# recommender (see cache_features). Only the 15 floats are cached.
+
+import hashlib, os
+import numpy as np
+
+from shared.feature_cache import FeatureCache
+from shared.fetcher import fetch_bytes, decode_audio, decode_windows, window_span
+from shared.spectral import Spectrum
+
+
+AUDIO_DIM = 15         # tempo + centroid + 13 MFCC
+
+# full  decode the whole track
+# hook  decode only the windows from audio_windows()
+# Set WAVEHOOK_AUDIO_WINDOW the same for the hook stage and the
+# recommender, or the cached blocks won't match what it asks for.
+AUDIO_WINDOWS = ("full", "hook")
+AUDIO_WINDOW = os.environ.get("WAVEHOOK_AUDIO_WINDOW", "full")
+
+HOOK_WINDOW = 15       # seconds either side of the prime hook
+EXCERPTS = 3           # evenly spaced excerpts when there is no hook ...
+EXCERPT_SECONDS = 10   # ... of this many seconds each
+
+
+def audio_windows(hook_start, duration):
+    """
+    [(offset, seconds), ...] to decode for one song, or None for the
+    whole track (no hook and no usable duration, or a short track).
+    """
+    if hook_start is not None and np.isfinite(hook_start):
+        return [(max(float(hook_start) - HOOK_WINDOW, 0.0), 2.0 * HOOK_WINDOW)]
+
+    if duration is None or not np.isfinite(duration) or duration <= EXCERPTS * EXCERPT_SECONDS * 2:
+        return None
+
+    step = duration / (EXCERPTS + 1)
+    return [(step * (i + 1) - EXCERPT_SECONDS / 2, float(EXCERPT_SECONDS)) for i in range(EXCERPTS)]
+
+
+def audio_key(url, windows):
+    """What the audio block is computed from: the URL, plus the windows."""
+    return url if windows is None else f"{url} {windows}"
+
+
+def audio_fingerprint(url, windows):
+    # feature_extractor.digest() of audio_key
+    return hashlib.md5(str(audio_key(url, windows)).encode()).hexdigest()[:16]
+
+
+def cache_name(windows):
+    if windows is None:
+        return "audio"
+    return "audio-" + hashlib.md5(str(windows).encode()).hexdigest()[:12]
+
+
+def load_windows(url, windows):
+    """Native-rate mono samples of just the windows, concatenated."""
+    return decode_windows(fetch_bytes(url), windows)
+
+
+def slice_windows(y, sr, windows):
+    """Same samples as load_windows(), from an already decoded signal."""
+    return np.concatenate([y[slice(*window_span(o, d, sr))] for o, d in windows])
+
+
+def signal_features(y, sr):
+    # one STFT for all three, at the signal's own rate
+    spec = Spectrum(y, sr)
+
+    mfcc = np.mean(spec.mfcc(13), axis=0)
+    tempo = spec.tempo()
+    centroid = np.mean(spec.centroid())
+
+    return np.concatenate(([tempo, centroid], mfcc))
+
+
+def cache_features(song_id, url, y, sr, windows, cache=None):
+    """
+    Hook stage: compute the block from an already decoded native-rate
+    signal and leave it in the cache for the recommender.
+    """
+    if windows:
+        y = slice_windows(y, sr, windows)
+
+    (cache or FeatureCache()).put(
+        song_id, url, cache_name(windows),
+        features=signal_features(y, sr).astype(np.float32)
+    )
+
+
+def audio_features(song_id, url, windows=None, cache=None):
+    """
+    The block for one song: taken (and removed) from the cache when the
+    hook stage left it there, otherwise fetched and decoded here.
+    """
+    try:
+        entry = (cache or FeatureCache()).pop(song_id, url, cache_name(windows))
+        if entry is not None and len(entry["features"]) == AUDIO_DIM:
+            return entry["features"].astype(np.float64)
+
+        if windows:
+            y, sr = load_windows(url, windows)
+        else:
+            y, sr = decode_audio(fetch_bytes(url))
+
+        return signal_features(y, sr)
+    except Exception as e:
+        print(f"[ERROR] Audio feature failed: {e}")
+        return np.zeros(AUDIO_DIM)
@@ -0,0 +1,70 @@
+# Write buffer for the cron scripts: accumulates pymongo write
+# operations and flushes them as one unordered bulk_write, either every
+# `batch_size` operations or once `flush_interval` seconds have passed.
+# A failing document is reported on its own and never sinks the batch.
+
+import time
+from pymongo.errors import BulkWriteError, PyMongoError
+
+
+class BulkWriter:
+
+    def __init__(self, collection, batch_size=500, flush_interval=5.0):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.ops = []
+        self.doc_ids = []
+        self.last_flush = time.monotonic()
+
+        self.written = 0
+        self.failed = []   # (doc_id, error message)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+    def add(self, op, doc_id=None):
+        self.ops.append(op)
+        self.doc_ids.append(doc_id)
+
+        if len(self.ops) >= self.batch_size or self.due():
+            self.flush()
+
+    def due(self):
+        return time.monotonic() - self.last_flush >= self.flush_interval
+
+    def flush(self):
+        ops, doc_ids = self.ops, self.doc_ids
+        self.ops, self.doc_ids = [], []
+        self.last_flush = time.monotonic()
+
+        if not ops:
+            return
+
+        try:
+            self.collection.bulk_write(ops, ordered=False)
+            self.written += len(ops)
+
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+
+            for err in errors:
+                self._fail(doc_ids[err["index"]], err.get("errmsg"))
+
+            for err in e.details.get("writeConcernErrors", []):
+                print(f"⚠️ Write concern error: {err.get('errmsg')}")
+
+            self.written += len(ops) - len(errors)
+
+        except PyMongoError as e:
+            # whole batch lost (network, auth ...) → every document failed
+            for doc_id in doc_ids:
+                self._fail(doc_id, repr(e))
+
+    def _fail(self, doc_id, message):
+        self.failed.append((doc_id, message))
+        print(f"❌ Write failed ({doc_id}): {message}")
@@ -0,0 +1,122 @@
+# Local on-disk hand-off of derived features between pipeline stages:
+# hookSelector/process.py already holds each song's decoded signal, so
+# it leaves the recommender's audio block here instead of the recommender
+# fetching and decoding the song again (Recommendation/feature_extractor.py).
+#
+# Only small derived arrays are stored (a few hundred bytes per song), and
+# only for songs the recommender will recompute; it removes each entry as
+# it reads it. The size budget is a backstop for entries nobody consumes.
+#
+# Entries are .npz files named <song id>-<url hash>.<name>.npz. Reads
+# refresh the file mtime; every EVICT_EVERY writes the least recently
+# used entries are removed once the directory grows past the budget.
+# Writes go through a temp file + os.replace, so several processes can
+# share one directory.
+
+import hashlib, os, re, tempfile
+import numpy as np
+
+
+# ----------------------------
+# CONFIG
+# ----------------------------
+CACHE_DIR = os.environ.get(
+    "WAVEHOOK_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "wavehook")
+)
+CACHE_MAX_BYTES = int(os.environ.get("WAVEHOOK_CACHE_MB", "256")) << 20
+
+ENTRY_BYTES = 4096    # disk use of one features entry (one filesystem block)
+EVICT_EVERY = 256     # writes between eviction scans (a scan lists the directory)
+
+
+class FeatureCache:
+
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.writes = 0
+        os.makedirs(root, exist_ok=True)
+
+    def capacity(self):
+        """Roughly how many features entries fit in the budget."""
+        return self.max_bytes // ENTRY_BYTES
+
+    def key(self, song_id, url):
+        url_hash = hashlib.sha1(url.encode()).hexdigest()[:16]
+        return f"{re.sub(r'[^A-Za-z0-9_-]', '_', str(song_id))}-{url_hash}"
+
+    def path(self, song_id, url, name):
+        return os.path.join(self.root, f"{self.key(song_id, url)}.{name}.npz")
+
+    def has(self, song_id, url, name):
+        return os.path.exists(self.path(song_id, url, name))
+
+    def get(self, song_id, url, name):
+        """Dict of arrays, or None on a miss (or an unreadable entry)."""
+        path = self.path(song_id, url, name)
+
+        try:
+            with np.load(path) as entry:
+                arrays = {k: entry[k] for k in entry.files}
+            os.utime(path)
+            return arrays
+
+        except FileNotFoundError:
+            return None
+
+        except Exception as e:
+            print(f"⚠️ Dropping unreadable cache entry {path}: {repr(e)}")
+            self._remove(path)
+            return None
+
+    def pop(self, song_id, url, name):
+        """get() and remove the entry (for the stage that consumes it)."""
+        arrays = self.get(song_id, url, name)
+        if arrays is not None:
+            self._remove(self.path(song_id, url, name))
+        return arrays
+
+    def put(self, song_id, url, name, **arrays):
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp, self.path(song_id, url, name))
+        except Exception:
+            self._remove(tmp)
+            raise
+
+        self.writes += 1
+        if self.writes % EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self):
+        entries = []
+        total = 0
+
+        for entry in os.scandir(self.root):
+            if not entry.name.endswith(".npz"):
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            size = max(st.st_size, ENTRY_BYTES)
+            entries.append((st.st_mtime, size, entry.path))
+            total += size
+
+        entries.sort()
+
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,257 @@
+# Shared audio fetcher used by hookSelector/process.py and
+# Recommendation/feature_extractor.py.
+#
+# One pooled keep-alive session per process, large streaming chunks,
+# retries with exponential backoff and a hard size cap. Audio can be
+# kept in memory and decoded straight from the buffer through ffmpeg.
+
+import io, os, subprocess, tempfile, time
+import librosa
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+
+# ----------------------------
+# CONFIG
+# ----------------------------
+CHUNK_SIZE = 1 << 20           # 1 MB streaming chunks
+MAX_AUDIO_BYTES = 64 << 20     # refuse anything larger than 64 MB
+TIMEOUT = (10, 40)             # (connect, read) seconds
+RETRIES = 3
+BACKOFF = 1.0                  # 1s, 2s, 4s ...
+POOL_SIZE = 16
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# decoded audio from a pipe is staged here when the container can't be
+# demuxed without seeking (MP4 with the moov atom at the end)
+SCRATCH_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+
+class AudioTooLarge(ValueError):
+    pass
+
+
+# ----------------------------
+# Session
+# ----------------------------
+def make_session(pool_size=POOL_SIZE):
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+SESSION = make_session()
+
+
+def _retryable(e):
+    if isinstance(e, requests.HTTPError):
+        return e.response is not None and e.response.status_code in RETRY_STATUS
+    return isinstance(e, (
+        requests.ConnectionError,
+        requests.Timeout,
+        requests.exceptions.ChunkedEncodingError
+    ))
+
+
+def _download(url, sink, max_bytes, retries, backoff):
+    for attempt in range(retries + 1):
+        sink.seek(0)
+        sink.truncate()
+
+        try:
+            with SESSION.get(url, stream=True, timeout=TIMEOUT) as r:
+                r.raise_for_status()
+
+                if int(r.headers.get("Content-Length") or 0) > max_bytes:
+                    raise AudioTooLarge(f"{url} is larger than {max_bytes} bytes")
+
+                size = 0
+                for chunk in r.iter_content(CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise AudioTooLarge(f"{url} is larger than {max_bytes} bytes")
+                    sink.write(chunk)
+
+            return
+
+        except requests.RequestException as e:
+            if attempt == retries or not _retryable(e):
+                raise
+
+            wait = backoff * (2 ** attempt)
+            print(f"⚠️ Fetch failed ({repr(e)}), retrying in {wait:.0f}s...")
+            time.sleep(wait)
+
+
+# ----------------------------
+# Fetch
+# ----------------------------
+def fetch_bytes(url, max_bytes=MAX_AUDIO_BYTES, retries=RETRIES, backoff=BACKOFF):
+    """Download url into memory."""
+    buf = io.BytesIO()
+    _download(url, buf, max_bytes, retries, backoff)
+    return buf.getvalue()
+
+
+def fetch_to_file(url, suffix="", max_bytes=MAX_AUDIO_BYTES, retries=RETRIES, backoff=BACKOFF):
+    """Download url into a temp file and return its path (caller removes it)."""
+    temp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+
+    try:
+        _download(url, temp, max_bytes, retries, backoff)
+    except Exception:
+        temp.close()
+        os.remove(temp.name)
+        raise
+
+    temp.close()
+    return temp.name
+
+
+# ----------------------------
+# Decode
+# ----------------------------
+def _parse_wav(raw):
+    """(samples, sr) from ffmpeg's float32 WAV output (sizes may be unset)."""
+    pos = 12
+    channels = sr = None
+
+    while pos + 8 <= len(raw):
+        chunk_id = raw[pos:pos + 4]
+        size = int.from_bytes(raw[pos + 4:pos + 8], "little")
+
+        if chunk_id == b"fmt ":
+            channels = int.from_bytes(raw[pos + 10:pos + 12], "little")
+            sr = int.from_bytes(raw[pos + 12:pos + 16], "little")
+
+        elif chunk_id == b"data":
+            data = raw[pos + 8:]
+            data = data[:len(data) - len(data) % (4 * channels)]
+            if not data:
+                break
+            y = np.frombuffer(data, dtype=np.float32).reshape(-1, channels)
+            return y, sr
+
+        pos += 8 + size + (size & 1)
+
+    raise RuntimeError("ffmpeg produced no audio")
+
+
+def _ffmpeg_wav(source, stdin=None, out_args=(), in_args=()):
+    cmd = ["ffmpeg", "-v", "error"]
+    if stdin is None:
+        cmd.append("-nostdin")
+
+    proc = subprocess.run(
+        cmd + [
+            *in_args, "-i", source,
+            "-vn", *out_args, "-f", "wav", "-acodec", "pcm_f32le",
+            "pipe:1"
+        ],
+        input=stdin,
+        capture_output=True
+    )
+
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg decode failed: {proc.stderr.decode(errors='replace').strip()}")
+
+    return proc.stdout
+
+
+def _ffmpeg_decode(audio, out_args=(), in_args=()):
+    """(samples, sr) for a file path or encoded bytes."""
+    if isinstance(audio, str):
+        return _parse_wav(_ffmpeg_wav(audio, out_args=out_args, in_args=in_args))
+
+    try:
+        return _parse_wav(_ffmpeg_wav("pipe:0", stdin=audio, out_args=out_args, in_args=in_args))
+
+    except RuntimeError:
+        # non-streamable container → stage on tmpfs so ffmpeg can seek
+        with tempfile.NamedTemporaryFile(dir=SCRATCH_DIR) as f:
+            f.write(audio)
+            f.flush()
+            return _parse_wav(_ffmpeg_wav(f.name, out_args=out_args, in_args=in_args))
+
+
+def decode_audio(data, sr=None, mono=True, res_type="soxr_hq"):
+    """
+    Decode encoded audio bytes without touching disk.
+
+    Mirrors librosa.load(): float32 output, channels averaged when mono,
+    and resampled with res_type when sr is given (sr=None keeps native rate).
+    """
+    y, native_sr = _ffmpeg_decode(data)
+    return _finish(y, native_sr, sr, mono, res_type)
+
+
+def _finish(y, native_sr, sr=None, mono=True, res_type="soxr_hq"):
+    y = y.mean(axis=1) if mono else y.T
+    y = np.ascontiguousarray(y, dtype=np.float32)
+
+    if sr is not None and sr != native_sr:
+        y = librosa.resample(y, orig_sr=native_sr, target_sr=sr, res_type=res_type)
+        return y, sr
+
+    return y, native_sr
+
+
+def _us(seconds):
+    return int(round(seconds * 1e6))
+
+
+def window_span(offset, seconds, sr):
+    """
+    [first, end) sample of a window, rounded the way ffmpeg's atrim
+    rounds microsecond times, so slicing a full decode matches
+    decode_windows() sample for sample.
+    """
+    return tuple((_us(t) * sr + 500000) // 1000000 for t in (offset, offset + seconds))
+
+
+def decode_windows(data, windows, mono=True):
+    """
+    Native-rate samples of just [(offset, seconds), ...], concatenated.
+
+    One ffmpeg process trims the windows out of the decoded stream and
+    stops reading after the last one. ffmpeg still decodes everything up
+    to there (it only skips writing it out); input seeking (-ss) would be
+    cheaper but isn't sample-exact against a full decode, and the hook
+    stage hands the same block over from one (see audio_features).
+    """
+    n = len(windows)
+    graph = f"[0:a]asplit={n}" + "".join(f"[s{i}]" for i in range(n)) + ";"
+
+    for i, (offset, seconds) in enumerate(windows):
+        graph += f"[s{i}]atrim=start={_us(offset)}us:end={_us(offset + seconds)}us,asetpts=N/SR/TB[w{i}];"
+
+    graph += "".join(f"[w{i}]" for i in range(n)) + f"concat=n={n}:v=0:a=1"
+
+    last = max(offset + seconds for offset, seconds in windows)
+    y, native_sr = _ffmpeg_decode(
+        data,
+        out_args=["-filter_complex", graph],
+        in_args=["-t", f"{last + 1:.3f}"]
+    )
+
+    return _finish(y, native_sr, mono=mono)
+
+
+def decode_pcm(audio, sr, soxr=False):
+    """
+    Fast path: ffmpeg downmixes to mono and resamples while decoding,
+    so no native-rate copy is ever materialised.
+
+    audio: file path or encoded bytes
+    soxr: use ffmpeg's soxr resampler instead of its default (swr)
+    """
+    out_args = ["-ac", "1", "-ar", str(sr)]
+    if soxr:
+        out_args += ["-af", "aresample=resampler=soxr"]
+
+    y, _ = _ffmpeg_decode(audio, out_args)
+    return np.ascontiguousarray(y[:, 0]), sr
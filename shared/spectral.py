@@ -0,0 +1,133 @@
+# One framing / STFT / mel spectrogram per signal, with every spectral
+# feature the hook analyzer and the recommender use derived from it.
+#
+# librosa's feature functions each recompute the STFT (rms frames the
+# signal, onset_strength and mfcc both build a mel spectrogram, and
+# spectral_centroid and beat.tempo take another STFT each). Here the
+# signal is framed once with librosa's centered framing (n_fft // 2 zeros
+# on both ends), so every curve has one value per frame by construction
+# and matches librosa's to float32 precision.
+#
+# See benchmarks/spectral_features.py for the speedup.
+
+from functools import lru_cache
+
+import librosa
+import numpy as np
+import scipy.fft
+
+
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MELS = 128
+N_MFCC = 13
+TOP_DB = 80.0
+CHUNK_FRAMES = 2048    # frames per rfft call, bounds the temporary copies
+
+
+@lru_cache(maxsize=8)
+def hann(n_fft):
+    return np.hanning(n_fft + 1)[:-1].astype(np.float32)
+
+
+@lru_cache(maxsize=8)
+def mel_basis(sr, n_fft, n_mels):
+    return librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels).T.astype(np.float32)
+
+
+def frame_spectra(frames, sr, n_mels=N_MELS):
+    """
+    (rms, magnitude, mel power) for a (n, n_fft) block of frames: one
+    value / row per frame. Shared by Spectrum and the streaming analyzer.
+    """
+    n_fft = frames.shape[1]
+
+    rms = np.empty(len(frames), dtype=np.float32)
+    magnitude = np.empty((len(frames), n_fft // 2 + 1), dtype=np.float32)
+
+    for lo in range(0, len(frames), CHUNK_FRAMES):
+        chunk = frames[lo:lo + CHUNK_FRAMES]
+        rms[lo:lo + len(chunk)] = np.sqrt(np.mean(np.square(chunk, dtype=np.float64), axis=1))
+        magnitude[lo:lo + len(chunk)] = np.abs(scipy.fft.rfft(chunk * hann(n_fft), axis=1))
+
+    mel = np.square(magnitude) @ mel_basis(sr, n_fft, n_mels)
+    return rms, magnitude, mel
+
+
+def power_db(mel, db_max=None, top_db=TOP_DB):
+    """librosa.power_to_db(ref=1.0): 10 log10, floored top_db below db_max (default: own max)."""
+    db = 10.0 * np.log10(np.maximum(1e-10, mel))
+    if db.size:
+        db_max = db.max() if db_max is None else db_max
+        db = np.maximum(db, db_max - top_db)
+    return db
+
+
+def mfcc_from_db(db, n_mfcc=N_MFCC):
+    """(frames, n_mfcc) MFCCs from a (frames, n_mels) log-mel spectrogram."""
+    return scipy.fft.dct(db, type=2, norm="ortho", axis=1)[:, :n_mfcc]
+
+
+def onset_flux(db):
+    """Mean positive log-mel difference between consecutive frames (one fewer than db)."""
+    return np.mean(np.maximum(0.0, np.diff(db, axis=0)), axis=1)
+
+
+def onset_pad(n_fft, hop_length):
+    # onset_strength pads 1 (lag) + n_fft // (2 * hop) frames in front
+    return 1 + n_fft // (2 * hop_length)
+
+
+class Spectrum:
+    """
+    Framing, magnitude STFT and mel spectrogram of one mono signal, and
+    the features derived from them. Every per-frame curve has len(self)
+    values.
+    """
+
+    def __init__(self, y, sr, n_fft=N_FFT, hop_length=HOP_LENGTH, n_mels=N_MELS):
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+
+        y = np.asarray(y, dtype=np.float32)
+        frames = librosa.util.frame(
+            np.pad(y, n_fft // 2),
+            frame_length=n_fft,
+            hop_length=hop_length,
+            axis=0
+        )
+        self.rms, self.magnitude, self.mel = frame_spectra(frames, sr, n_mels)
+        self._db = None
+
+    def __len__(self):
+        return len(self.rms)
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = power_db(self.mel)
+        return self._db
+
+    def mfcc(self, n_mfcc=N_MFCC):
+        return mfcc_from_db(self.db, n_mfcc)
+
+    def onset_strength(self):
+        """librosa.onset.onset_strength, aligned to the frames."""
+        flux = onset_flux(self.db)
+        return np.concatenate((np.zeros(onset_pad(self.n_fft, self.hop_length)), flux))[:len(self)]
+
+    def centroid(self):
+        """librosa.feature.spectral_centroid, per frame (0 for silent frames)."""
+        freqs = librosa.fft_frequencies(sr=self.sr, n_fft=self.n_fft).astype(np.float32)
+        total = self.magnitude.sum(axis=1)
+        weighted = self.magnitude @ freqs
+        return np.where(total > np.finfo(np.float32).tiny, weighted / np.maximum(total, np.finfo(np.float32).tiny), 0.0)
+
+    def tempo(self):
+        """librosa.feature.tempo from the shared onset envelope (bpm)."""
+        return float(librosa.feature.tempo(
+            onset_envelope=self.onset_strength(),
+            sr=self.sr,
+            hop_length=self.hop_length
+        )[0])
@@ -0,0 +1,93 @@
+# Storage format of song_vectors["vector"], shared by the recommender
+# job (writer) and the API (reader).
+#
+#   array    BSON array of doubles (the original format)
+#   float32  raw little-endian bytes in a BSON Binary
+#   float16  same, half precision
+#
+# Binary vectors carry a header next to them: {"dim": 1017, "dtype": "float32"}.
+# Readers accept every format, so a collection can be migrated in place.
+
+import os
+import numpy as np
+from bson.binary import Binary
+
+
+VECTOR_FORMATS = ("array", "float32", "float16")
+VECTOR_FORMAT = os.environ.get("WAVEHOOK_VECTOR_FORMAT", "array")
+
+# fields a reader has to project
+VECTOR_FIELDS = {"vector": 1, "dim": 1, "dtype": 1}
+
+
+def encode_vector(vec, fmt=VECTOR_FORMAT):
+    """Document fields for one vector (no header for the array format)."""
+    if fmt == "array":
+        return {"vector": np.asarray(vec, dtype="float64").tolist()}
+
+    if fmt not in VECTOR_FORMATS:
+        raise ValueError(f"Unknown vector format {fmt!r}. Use one of {VECTOR_FORMATS}")
+
+    raw = np.asarray(vec, dtype=np.dtype(fmt).newbyteorder("<"))
+    return {"vector": Binary(raw.tobytes()), "dim": len(raw), "dtype": fmt}
+
+
+def decode_vector(doc):
+    """1-D array view of a stored vector, or None when the doc has none."""
+    vec = doc.get("vector")
+    if vec is None:
+        return None
+
+    if isinstance(vec, (bytes, bytearray)):
+        dtype = np.dtype(doc.get("dtype", "float32")).newbyteorder("<")
+        out = np.frombuffer(vec, dtype=dtype)
+        if "dim" in doc and len(out) != doc["dim"]:
+            raise ValueError(f"Vector has {len(out)} values, header says {doc['dim']}")
+        return out
+
+    return np.asarray(vec, dtype="float32")
+
+
+class VectorStack:
+    """
+    Decodes vectors of any format straight into one float32 matrix,
+    preallocated from a size hint (e.g. estimated_document_count) and
+    grown by doubling if the hint was low.
+    """
+
+    def __init__(self, capacity=0):
+        self.capacity = capacity
+        self.rows = None
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, doc):
+        """False (nothing stored) when the doc has no vector."""
+        vec = decode_vector(doc)
+        if vec is None:
+            return False
+
+        if self.rows is None:
+            self.rows = np.empty((max(self.capacity, 1), len(vec)), dtype="float32")
+
+        if len(vec) != self.rows.shape[1]:
+            raise ValueError(f"Vector has {len(vec)} values, expected {self.rows.shape[1]}")
+
+        if self.size == len(self.rows):
+            grown = np.empty((2 * len(self.rows), self.rows.shape[1]), dtype="float32")
+            grown[:self.size] = self.rows
+            self.rows = grown
+
+        self.rows[self.size] = vec
+        self.size += 1
+        return True
+
+    def matrix(self):
+        """(n, dim) float32 matrix of everything appended."""
+        if self.rows is None:
+            return np.empty((0, 0), dtype="float32")
+        if self.size < len(self.rows):
+            self.rows = self.rows[:self.size].copy()
+        return self.rows